@@ -0,0 +1,187 @@
+import asyncio
+import json
+import logging
+import uuid
+from typing import Awaitable, Callable, List, Optional, Set
+
+from config import BROADCAST_BACKEND, BROADCAST_BROKER_ADDRESS
+
+logger = logging.getLogger(__name__)
+
+# Frames published to the broker that may wait while it is slow; live updates are
+# dropped rather than queued once this is reached or while the broker is unreachable
+BROKER_QUEUE_SIZE = 1000
+RECONNECT_MIN_SECONDS = 0.5
+RECONNECT_MAX_SECONDS = 10.0
+
+Handler = Callable[[str, dict], None]
+ConnectCallback = Callable[[], Awaitable[None]]
+
+class InProcessBroadcast:
+    """Delivers broadcasts to this process's own WebSocket clients only"""
+
+    def __init__(self):
+        self._handler: Optional[Handler] = None
+        self._published = 0
+
+    def subscribe(self, handler: Handler):
+        self._handler = handler
+
+    def on_connect(self, callback: ConnectCallback):
+        """Nothing is relayed, so no broadcast can be missed and `callback` never runs"""
+
+    async def start(self):
+        pass
+
+    async def stop(self):
+        pass
+
+    async def publish(self, channel: str, message: dict):
+        self._published += 1
+        self._handler(channel, message)
+
+    def metrics(self) -> dict:
+        return {"backend": "local", "published": self._published}
+
+class BrokerBroadcast:
+    """Delivers broadcasts locally right away and relays them through a broker
+    (scripts/broadcast_broker.py) to every other worker and instance.
+
+    Frames are newline-delimited JSON: {"origin", "channel", "message"}. publish() never
+    waits on the network; the connection is kept up by a background task that
+    reconnects with backoff. Frames published elsewhere while it is down are lost, so
+    on_connect() callbacks run after every (re)connect to reload what they kept in step.
+    """
+
+    def __init__(self, host: str, port: int):
+        self.host = host
+        self.port = port
+        self.origin = uuid.uuid4().hex
+        self._handler: Optional[Handler] = None
+        self._outbound: asyncio.Queue = asyncio.Queue(maxsize=BROKER_QUEUE_SIZE)
+        self._task: Optional[asyncio.Task] = None
+        self.connected = False
+        self._published = 0
+        self._forwarded = 0
+        self._received = 0
+        self._dropped = 0
+        self._malformed = 0
+        self._connects = 0
+        self._connect_callbacks: List[ConnectCallback] = []
+        self._callback_tasks: Set[asyncio.Task] = set()
+
+    def subscribe(self, handler: Handler):
+        self._handler = handler
+
+    def on_connect(self, callback: ConnectCallback):
+        self._connect_callbacks.append(callback)
+
+    async def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        for task in list(self._callback_tasks):
+            task.cancel()
+
+    async def publish(self, channel: str, message: dict):
+        self._published += 1
+        self._handler(channel, message)
+        if not self.connected:
+            self._dropped += 1
+            return
+        frame = json.dumps({"origin": self.origin, "channel": channel, "message": message}) + "\n"
+        try:
+            self._outbound.put_nowait(frame.encode())
+        except asyncio.QueueFull:
+            self._dropped += 1
+
+    async def _run(self):
+        delay = RECONNECT_MIN_SECONDS
+        while True:
+            try:
+                reader, writer = await asyncio.open_connection(self.host, self.port)
+            except OSError as e:
+                logger.warning(f"Broadcast broker {self.host}:{self.port} unreachable: {e}; retrying in {delay}s")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, RECONNECT_MAX_SECONDS)
+                continue
+
+            logger.info(f"Connected to broadcast broker {self.host}:{self.port}")
+            self.connected = True
+            self._connects += 1
+            delay = RECONNECT_MIN_SECONDS
+            # Frames from this point on are received, so a reload started now misses none
+            for callback in self._connect_callbacks:
+                task = asyncio.create_task(callback())
+                self._callback_tasks.add(task)
+                task.add_done_callback(self._callback_tasks.discard)
+            sender = asyncio.create_task(self._send(writer))
+            try:
+                await self._receive(reader)
+            except (OSError, ValueError) as e:
+                logger.warning(f"Broadcast broker connection failed: {e}")
+            except Exception:
+                # A failing handler must not stop this task, or the worker never reconnects
+                logger.exception("Broadcast broker receive failed")
+            finally:
+                self.connected = False
+                sender.cancel()
+                writer.close()
+                # Frames queued for the old connection are stale by the time it is back
+                while not self._outbound.empty():
+                    self._outbound.get_nowait()
+                    self._dropped += 1
+            logger.warning(f"Lost broadcast broker {self.host}:{self.port}; reconnecting")
+            await asyncio.sleep(delay)
+
+    async def _send(self, writer: asyncio.StreamWriter):
+        while True:
+            frame = await self._outbound.get()
+            writer.write(frame)
+            await writer.drain()
+            self._forwarded += 1
+
+    async def _receive(self, reader: asyncio.StreamReader):
+        while True:
+            line = await reader.readline()
+            if not line:
+                return
+            try:
+                frame = json.loads(line)
+                if frame["origin"] == self.origin:
+                    continue
+                channel, message = frame["channel"], frame["message"]
+                if not isinstance(channel, str) or not isinstance(message, dict):
+                    raise TypeError("channel must be a string and message an object")
+            except (ValueError, KeyError, TypeError):
+                self._malformed += 1
+                continue
+            self._received += 1
+            self._handler(channel, message)
+
+    def metrics(self) -> dict:
+        return {
+            "backend": "broker",
+            "broker": f"{self.host}:{self.port}",
+            "connected": self.connected,
+            "connects": self._connects,
+            "published": self._published,
+            "forwarded": self._forwarded,
+            "received": self._received,
+            "dropped": self._dropped,
+            "malformed": self._malformed,
+        }
+
+def create_broadcast_backend():
+    if BROADCAST_BACKEND == "broker":
+        host, port = BROADCAST_BROKER_ADDRESS.rsplit(":", 1)
+        return BrokerBroadcast(host, int(port))
+    return InProcessBroadcast()
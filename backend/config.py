@@ -1,7 +1,7 @@
 import os
 import base64
 import firebase_admin
-from firebase_admin import credentials, firestore, auth
+from firebase_admin import credentials, firestore, firestore_async, auth
 import logging
 
 logging.basicConfig(level=logging.INFO)
@@ -9,6 +9,51 @@ logger = logging.getLogger(__name__)
 
 FIREBASE_CREDENTIALS_PATH = "firebase-credentials.json"
 
+# Inference micro-batching: characters from concurrent requests share one forward pass
+INFERENCE_MAX_BATCH_SIZE = int(os.getenv("INFERENCE_MAX_BATCH_SIZE", "64"))
+INFERENCE_MAX_WAIT_MS = float(os.getenv("INFERENCE_MAX_WAIT_MS", "5"))
+INFERENCE_MAX_QUEUE_DEPTH = int(os.getenv("INFERENCE_MAX_QUEUE_DEPTH", "1024"))
+
+# Dedicated inference pool: "thread" or "process". At most pool size + queue limit batches are
+# handed to it; later characters wait in the scheduler queue, and past its depth requests get 503
+INFERENCE_EXECUTOR = os.getenv("INFERENCE_EXECUTOR", "thread")
+INFERENCE_POOL_SIZE = int(os.getenv("INFERENCE_POOL_SIZE", "2"))
+INFERENCE_POOL_QUEUE_LIMIT = int(os.getenv("INFERENCE_POOL_QUEUE_LIMIT", "4"))
+
+# Model warm-up attempts at startup before /ready reports the failure, and the pause between them
+WARM_UP_ATTEMPTS = int(os.getenv("WARM_UP_ATTEMPTS", "3"))
+WARM_UP_RETRY_SECONDS = float(os.getenv("WARM_UP_RETRY_SECONDS", "10"))
+
+# Memory budget for cached per-character predictions (0 disables the cache)
+PREDICTION_CACHE_MAX_BYTES = int(os.getenv("PREDICTION_CACHE_MAX_BYTES", str(8 * 1024 * 1024)))
+
+# Level documents are served from memory and reloaded in bulk after this many seconds
+LEVEL_CACHE_TTL_SECONDS = float(os.getenv("LEVEL_CACHE_TTL_SECONDS", "300"))
+
+# Login answers (uid, role, profile) cached per email; signup and delete invalidate them
+LOGIN_CACHE_TTL_SECONDS = float(os.getenv("LOGIN_CACHE_TTL_SECONDS", "600"))
+LOGIN_CACHE_MAX_ENTRIES = int(os.getenv("LOGIN_CACHE_MAX_ENTRIES", "10000"))
+
+# Documents the admin stats counters are spread over; more shards take more concurrent writes
+STATS_SHARDS = int(os.getenv("STATS_SHARDS", "16"))
+
+# PBKDF2-SHA256 rounds for passwords hashed locally by bulk enrollment (Firebase accepts up to 120000)
+BULK_IMPORT_PBKDF2_ROUNDS = int(os.getenv("BULK_IMPORT_PBKDF2_ROUNDS", "10000"))
+
+# Outbound messages queued per WebSocket client before it counts as too slow and is dropped,
+# and how long one send may take
+WS_SEND_QUEUE_SIZE = int(os.getenv("WS_SEND_QUEUE_SIZE", "32"))
+WS_SEND_TIMEOUT_SECONDS = float(os.getenv("WS_SEND_TIMEOUT_SECONDS", "10"))
+
+# Broadcasts reach the WebSocket clients of this process only ("local"), or of every worker
+# and instance through scripts/broadcast_broker.py ("broker") listening on host:port
+BROADCAST_BACKEND = os.getenv("BROADCAST_BACKEND", "local")
+BROADCAST_BROKER_ADDRESS = os.getenv("BROADCAST_BROKER_ADDRESS", "127.0.0.1:8765")
+
+# "firestore", or "memory" to run the API on in-process stand-ins for Firestore and Firebase Auth
+# (for load tests and profiling; nothing is persisted)
+DATA_BACKEND = os.getenv("DATA_BACKEND", "firestore")
+
 def initialize_firebase():
     try:
         # Decode Base64 env var if file is missing
@@ -33,15 +78,32 @@ def initialize_firebase():
         logger.error(f"Failed to initialize Firebase: {str(e)}")
         raise
 
-# Initialize Firebase when module is imported
-initialize_firebase()
-
+# Firebase is initialized on first use, so importing settings from here costs nothing
+# and the memory backend never needs credentials
 def get_db():
     try:
+        initialize_firebase()
         return firestore.client()
     except Exception as e:
         logger.error(f"Failed to get Firestore client: {str(e)}")
         raise
 
+# Request handlers use the AsyncClient so Firestore round trips never block the event loop;
+# get_db() stays for one-off scripts, which always work on Firestore
+def get_async_db():
+    if DATA_BACKEND == "memory":
+        from memory_backend import memory_db
+        return memory_db
+    try:
+        initialize_firebase()
+        return firestore_async.client()
+    except Exception as e:
+        logger.error(f"Failed to get async Firestore client: {str(e)}")
+        raise
+
 def get_auth():
+    if DATA_BACKEND == "memory":
+        from memory_backend import memory_auth
+        return memory_auth
+    initialize_firebase()
     return auth
\ No newline at end of file
@@ -0,0 +1,71 @@
+import asyncio
+import logging
+import multiprocessing
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Callable, Optional
+
+from config import INFERENCE_EXECUTOR, INFERENCE_POOL_QUEUE_LIMIT, INFERENCE_POOL_SIZE
+
+logger = logging.getLogger(__name__)
+
+class BoundedExecutor:
+    """Inference pool of `max_workers`. `queue_limit` is how many submitted jobs may wait
+    for a free worker; the inference scheduler holds back anything past that."""
+
+    def __init__(self, kind: str, max_workers: int, queue_limit: int):
+        if kind not in ("thread", "process"):
+            raise ValueError(f"Unknown executor kind: {kind}")
+        self.kind = kind
+        self.max_workers = max_workers
+        self.queue_limit = queue_limit
+        self._executor: Optional[Executor] = None
+        # Only touched from the event loop thread, so no lock is needed
+        self._in_flight = 0
+        self._completed = 0
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            if self.kind == "process":
+                # Spawn, not fork: forking a process that already runs TensorFlow threads is unsafe
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+            else:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers,
+                    thread_name_prefix="inference",
+                )
+            logger.info(f"Inference {self.kind} pool started with {self.max_workers} workers")
+        return self._executor
+
+    async def run(self, fn: Callable, *args):
+        """Run fn(*args) on the pool"""
+        self._in_flight += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._get_executor(), fn, *args)
+        finally:
+            self._in_flight -= 1
+            self._completed += 1
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def metrics(self) -> dict:
+        return {
+            "kind": self.kind,
+            "pool_size": self.max_workers,
+            "queue_limit": self.queue_limit,
+            "in_flight": self._in_flight,
+            "queued": max(0, self._in_flight - self.max_workers),
+            "completed": self._completed,
+        }
+
+# Global inference executor instance
+inference_executor = BoundedExecutor(
+    INFERENCE_EXECUTOR,
+    max_workers=INFERENCE_POOL_SIZE,
+    queue_limit=INFERENCE_POOL_QUEUE_LIMIT,
+)
@@ -0,0 +1,157 @@
+import asyncio
+import logging
+import time
+from typing import Callable, List, Optional, Set, Tuple
+
+import numpy as np
+
+from config import INFERENCE_MAX_BATCH_SIZE, INFERENCE_MAX_QUEUE_DEPTH, INFERENCE_MAX_WAIT_MS
+from inference_executor import BoundedExecutor, inference_executor
+from scripts.inference import run_batch
+
+logger = logging.getLogger(__name__)
+
+class SchedulerOverloaded(Exception):
+    """Raised when the inference queue is already holding its maximum depth"""
+
+class InferenceScheduler:
+    def __init__(
+        self,
+        predict_fn: Callable[[np.ndarray], Tuple[np.ndarray, int]],
+        executor: BoundedExecutor,
+        max_batch_size: int,
+        max_wait_ms: float,
+        max_queue_depth: int,
+    ):
+        self.predict_fn = predict_fn
+        self.executor = executor
+        self.max_batch_size = max_batch_size
+        self.max_wait_ms = max_wait_ms
+        self.max_queue_depth = max_queue_depth
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._running: Set[asyncio.Task] = set()
+        # Characters waiting in the queue, not requests
+        self._queue_depth = 0
+        self._batches = 0
+        self._requests = 0
+        self._characters = 0
+        self._fold_evaluations = 0
+        self._last_batch_size = 0
+        self._rejected = 0
+        self._total_wait = 0.0
+
+    def _ensure_started(self):
+        if self._worker is None or self._worker.done():
+            self._queue = asyncio.Queue()
+            # A batch per pool worker plus the executor's queue limit waiting for one; past
+            # that, characters keep accumulating in the queue, up to max_queue_depth
+            self._slots = asyncio.Semaphore(self.executor.max_workers + self.executor.queue_limit)
+            self._worker = asyncio.create_task(self._run())
+            logger.info(
+                f"Inference scheduler started (max batch {self.max_batch_size}, "
+                f"max wait {self.max_wait_ms}ms, max queue {self.max_queue_depth})"
+            )
+
+    async def predict(self, batch: np.ndarray) -> np.ndarray:
+        """Queue a (N, 32, 32, 1) batch and wait for its averaged probabilities"""
+        self._ensure_started()
+        if self._queue_depth + len(batch) > self.max_queue_depth:
+            self._rejected += 1
+            raise SchedulerOverloaded("Inference queue is full")
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((batch, future, time.perf_counter()))
+        self._queue_depth += len(batch)
+        return await future
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            await self._slots.acquire()
+            jobs = [await self._queue.get()]
+            size = len(jobs[0][0])
+            deadline = loop.time() + self.max_wait_ms / 1000
+
+            # Keep collecting until the batch is full or the oldest job has waited long enough
+            while size < self.max_batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                # asyncio.timeout rather than wait_for, which can swallow a cancellation on 3.11
+                try:
+                    async with asyncio.timeout(timeout):
+                        job = await self._queue.get()
+                except TimeoutError:
+                    break
+                jobs.append(job)
+                size += len(job[0])
+
+            task = asyncio.create_task(self._run_batch(jobs, size))
+            self._running.add(task)
+            task.add_done_callback(self._running.discard)
+
+    async def _run_batch(self, jobs: List[Tuple[np.ndarray, asyncio.Future, float]], size: int):
+        self._queue_depth -= size
+        started = time.perf_counter()
+        self._total_wait += sum(started - queued_at for _, _, queued_at in jobs)
+        self._requests += len(jobs)
+
+        try:
+            stacked = np.concatenate([batch for batch, _, _ in jobs], axis=0)
+            probs, fold_evaluations = await self.executor.run(self.predict_fn, stacked)
+        except Exception as e:
+            logger.error(f"Inference batch of {size} characters failed: {str(e)}")
+            for _, future, _ in jobs:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        finally:
+            self._slots.release()
+
+        self._batches += 1
+        self._characters += size
+        self._fold_evaluations += fold_evaluations
+        self._last_batch_size = size
+
+        # Route each slice of the batch back to the request that queued it
+        offset = 0
+        for batch, future, _ in jobs:
+            if not future.done():
+                future.set_result(probs[offset:offset + len(batch)])
+            offset += len(batch)
+
+    async def stop(self):
+        tasks = list(self._running)
+        if self._worker is not None:
+            tasks.append(self._worker)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._worker = None
+
+    def metrics(self) -> dict:
+        return {
+            "queue_depth": self._queue_depth,
+            "queued_requests": self._queue.qsize() if self._queue is not None else 0,
+            "batches_in_flight": len(self._running),
+            "max_queue_depth": self.max_queue_depth,
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait_ms,
+            "batches": self._batches,
+            "characters": self._characters,
+            "last_batch_size": self._last_batch_size,
+            "average_batch_size": self._characters / self._batches if self._batches else 0.0,
+            "average_models_per_character": self._fold_evaluations / self._characters if self._characters else 0.0,
+            "average_queue_wait_ms": self._total_wait / self._requests * 1000 if self._requests else 0.0,
+            "rejected_requests": self._rejected,
+        }
+
+# Global inference scheduler instance
+scheduler = InferenceScheduler(
+    run_batch,
+    inference_executor,
+    max_batch_size=INFERENCE_MAX_BATCH_SIZE,
+    max_wait_ms=INFERENCE_MAX_WAIT_MS,
+    max_queue_depth=INFERENCE_MAX_QUEUE_DEPTH,
+)
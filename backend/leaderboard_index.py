@@ -0,0 +1,107 @@
+from bisect import bisect_left, bisect_right, insort
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+class LeaderboardIndex:
+    """Students with at least one star, kept sorted by (total_stars desc, uid).
+
+    Seeded at startup, re-seeded whenever broadcasts may have been missed, and updated
+    in place on every star change, so leaderboard reads never touch Firestore. Totals
+    only grow and uids are never reused, so a lower total or a change to a deleted
+    student is an older broadcast arriving late and is ignored. Used from the event loop only.
+    """
+
+    def __init__(self):
+        # Sort keys are (-total_stars, uid): ascending order is the leaderboard order
+        self._keys: List[Tuple[int, str]] = []
+        self._entries: Dict[str, dict] = {}
+        # Changes made while a seed is being read; they may be newer than its snapshot
+        self._pending: Dict[str, Tuple[str, int]] = {}
+        self._seeding = True
+        self._removed: Set[str] = set()
+        self.ready = False
+
+    def begin_seed(self):
+        """Call before reading the rows for seed(), so changes made meanwhile survive it"""
+        self._seeding = True
+
+    def seed(self, students: Iterable[Tuple[str, str, int]]):
+        """Replace the index with (uid, nickname, total_stars) rows"""
+        entries = {
+            uid: {'uid': uid, 'nickname': nickname, 'total_stars': total_stars}
+            for uid, nickname, total_stars in students
+            if total_stars > 0 and uid not in self._removed
+        }
+        self._entries = entries
+        self._keys = sorted((-entry['total_stars'], uid) for uid, entry in entries.items())
+        self.ready = True
+
+        pending, self._pending = self._pending, {}
+        self._seeding = False
+        for uid, change in pending.items():
+            self.update(uid, *change)
+        logger.info(f"Leaderboard index seeded with {len(self._keys)} students")
+
+    def _discard_key(self, uid: str):
+        entry = self._entries.pop(uid, None)
+        if entry is not None:
+            key = (-entry['total_stars'], uid)
+            i = bisect_left(self._keys, key)
+            if i < len(self._keys) and self._keys[i] == key:
+                del self._keys[i]
+
+    def update(self, uid: str, nickname: str, total_stars: int):
+        if uid in self._removed:
+            return
+        if self._seeding:
+            pending = self._pending.get(uid)
+            if pending is None or pending[1] <= total_stars:
+                self._pending[uid] = (nickname, total_stars)
+        if not self.ready:
+            return
+        entry = self._entries.get(uid)
+        if entry is not None and entry['total_stars'] > total_stars:
+            return
+        self._discard_key(uid)
+        if total_stars > 0:
+            self._entries[uid] = {'uid': uid, 'nickname': nickname, 'total_stars': total_stars}
+            insort(self._keys, (-total_stars, uid))
+
+    def remove(self, uid: str):
+        self._removed.add(uid)
+        self._pending.pop(uid, None)
+        self._discard_key(uid)
+
+    def page(self, offset: int = 0, limit: Optional[int] = None) -> List[dict]:
+        end = len(self._keys) if limit is None else offset + limit
+        return [dict(self._entries[uid]) for _, uid in self._keys[offset:end]]
+
+    def page_after(self, uid: str, limit: Optional[int] = None) -> Optional[List[dict]]:
+        """The page that follows `uid`, or None if `uid` is not on the board"""
+        entry = self._entries.get(uid)
+        if entry is None:
+            return None
+        return self.page(bisect_right(self._keys, (-entry['total_stars'], uid)), limit)
+
+    def top(self, k: int) -> List[dict]:
+        return self.page(0, k)
+
+    def rank(self, uid: str) -> Optional[int]:
+        """1-based rank; students with equal stars share a rank"""
+        entry = self._entries.get(uid)
+        if entry is None:
+            return None
+        # Every key before (-stars,) belongs to a student with strictly more stars
+        return bisect_left(self._keys, (-entry['total_stars'],)) + 1
+
+    def get(self, uid: str) -> Optional[dict]:
+        entry = self._entries.get(uid)
+        return dict(entry) if entry is not None else None
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+# Global leaderboard index instance
+leaderboard_index = LeaderboardIndex()
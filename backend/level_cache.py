@@ -0,0 +1,105 @@
+import asyncio
+import hashlib
+import json
+import logging
+import time
+from typing import Awaitable, Callable, Dict, Optional
+
+from config import LEVEL_CACHE_TTL_SECONDS, get_async_db
+
+logger = logging.getLogger(__name__)
+
+async def read_all_levels() -> Dict[str, dict]:
+    """Every level document keyed by its id, in one query"""
+    return {level.id: level.to_dict() async for level in get_async_db().collection('levels').stream()}
+
+class LevelCache:
+    """Read-through cache of all level documents, reloaded in bulk when the TTL runs out.
+
+    Admin edits call invalidate(), so this process serves them on the next read; other
+    worker processes pick them up within the TTL. `version` is a hash of the content,
+    so it is the same on every process holding the same levels.
+    Only used from the event loop.
+    """
+
+    def __init__(self, loader: Callable[[], Awaitable[Dict[str, dict]]], ttl_seconds: float):
+        self.loader = loader
+        self.ttl_seconds = ttl_seconds
+        self._levels: Dict[str, dict] = {}
+        self._loaded_at: Optional[float] = None
+        self._lock = asyncio.Lock()
+        self.version: Optional[str] = None
+        self._hits = 0
+        self._misses = 0
+        self._loads = 0
+        self._invalidations = 0
+        # Bumped by invalidate(); a reload started before the bump may have read the old content
+        self._generation = 0
+        self._discarded = 0
+
+    def _fresh(self) -> bool:
+        return self._loaded_at is not None and time.monotonic() - self._loaded_at < self.ttl_seconds
+
+    async def refresh(self):
+        """Reload every level now"""
+        generation = self._generation
+        levels = await self.loader()
+        if generation != self._generation:
+            # Invalidated while loading: this result may predate the edit, so keep it stale
+            self._discarded += 1
+            return
+        content = json.dumps(levels, sort_keys=True, default=str).encode()
+        version = hashlib.blake2b(content, digest_size=8).hexdigest()
+        if version != self.version:
+            logger.info(f"Loaded {len(levels)} levels, version {version}")
+        self._levels = levels
+        self.version = version
+        self._loaded_at = time.monotonic()
+        self._loads += 1
+
+    async def _ensure_fresh(self):
+        if self._fresh():
+            self._hits += 1
+            return
+        self._misses += 1
+        # Concurrent misses share one reload
+        async with self._lock:
+            while not self._fresh():
+                await self.refresh()
+
+    async def get(self, level_id) -> Optional[dict]:
+        await self._ensure_fresh()
+        level = self._levels.get(str(level_id))
+        return dict(level) if level is not None else None
+
+    async def all(self) -> Dict[str, dict]:
+        await self._ensure_fresh()
+        return {level_id: dict(level) for level_id, level in self._levels.items()}
+
+    async def current_version(self) -> str:
+        await self._ensure_fresh()
+        return self.version
+
+    def invalidate(self):
+        """Force a reload on the next read, e.g. after an admin edit"""
+        self._loaded_at = None
+        self._generation += 1
+        self._invalidations += 1
+
+    def metrics(self) -> dict:
+        lookups = self._hits + self._misses
+        return {
+            "levels": len(self._levels),
+            "version": self.version,
+            "age_seconds": time.monotonic() - self._loaded_at if self._loaded_at is not None else None,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self._hits,
+            "misses": self._misses,
+            "hit_rate": self._hits / lookups if lookups else 0.0,
+            "loads": self._loads,
+            "invalidations": self._invalidations,
+            "discarded_loads": self._discarded,
+        }
+
+# Global level cache instance
+level_cache = LevelCache(read_all_levels, LEVEL_CACHE_TTL_SECONDS)
@@ -0,0 +1,76 @@
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+from config import LOGIN_CACHE_MAX_ENTRIES, LOGIN_CACHE_TTL_SECONDS
+
+class LoginCache:
+    """Email -> login response (uid, role and profile), with a TTL and an LRU bound.
+
+    Signup and delete invalidate entries so a role change is never served stale
+    from this process; other workers see it once the TTL runs out.
+    Only used from the event loop, so it needs no locking.
+    """
+
+    def __init__(self, ttl_seconds: float, max_entries: int):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[float, dict]]" = OrderedDict()
+        self._emails_by_uid: Dict[str, str] = {}
+        self._hits = 0
+        self._misses = 0
+        self._invalidations = 0
+
+    @staticmethod
+    def _key(email: str) -> str:
+        # Firebase Auth treats emails case-insensitively
+        return email.strip().lower()
+
+    def get(self, email: str) -> Optional[dict]:
+        key = self._key(email)
+        entry = self._entries.get(key)
+        if entry is None or time.monotonic() - entry[0] >= self.ttl_seconds:
+            if entry is not None:
+                self._drop(key)
+            self._misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self._hits += 1
+        return dict(entry[1])
+
+    def put(self, email: str, profile: dict):
+        if self.max_entries <= 0:
+            return
+        key = self._key(email)
+        self._drop(key)
+        self._entries[key] = (time.monotonic(), dict(profile))
+        self._emails_by_uid[profile['uid']] = key
+        while len(self._entries) > self.max_entries:
+            self._drop(next(iter(self._entries)))
+
+    def _drop(self, key: str):
+        entry = self._entries.pop(key, None)
+        if entry is not None and self._emails_by_uid.get(entry[1]['uid']) == key:
+            del self._emails_by_uid[entry[1]['uid']]
+
+    def invalidate(self, email: Optional[str] = None, uid: Optional[str] = None):
+        if email is not None:
+            self._drop(self._key(email))
+        if uid is not None and uid in self._emails_by_uid:
+            self._drop(self._emails_by_uid[uid])
+        self._invalidations += 1
+
+    def metrics(self) -> dict:
+        lookups = self._hits + self._misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self._hits,
+            "misses": self._misses,
+            "hit_rate": self._hits / lookups if lookups else 0.0,
+            "invalidations": self._invalidations,
+        }
+
+# Global login cache instance
+login_cache = LoginCache(LOGIN_CACHE_TTL_SECONDS, LOGIN_CACHE_MAX_ENTRIES)
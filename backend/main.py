@@ -1,14 +1,106 @@
 import os
+import asyncio
+import logging
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
-from routes.student import student_router
+from fastapi.responses import JSONResponse
+from routes.student import student_router, load_nickname_registry
 from routes.admin import admin_router
 from routes.auth import auth_router
 from routes.websocket import websocket_router
 from routes.level import levels_router
 from routes.task import predict_router
-from routes.leaderboard import leaderboard_router
-app = FastAPI()
+from routes.leaderboard import leaderboard_router, load_leaderboard_index
+from inference_scheduler import scheduler
+from inference_executor import inference_executor
+from prediction_cache import prediction_cache
+from level_cache import level_cache
+from login_cache import login_cache
+from nickname_registry import nickname_registry
+from websocket_manager import manager
+from scripts.inference import warm_up, buffer_pool, get_label_encoder
+import stats_rollup
+from config import DATA_BACKEND, WARM_UP_ATTEMPTS, WARM_UP_RETRY_SECONDS, get_async_db
+
+logger = logging.getLogger(__name__)
+
+async def warm_up_models(app: FastAPI):
+    """Load and warm the models on every inference worker, then mark the app ready.
+    Failures are retried; the last one is kept for /ready to report."""
+    for attempt in range(1, WARM_UP_ATTEMPTS + 1):
+        try:
+            await asyncio.gather(*(
+                inference_executor.run(warm_up) for _ in range(inference_executor.max_workers)
+            ))
+            # Predictions are decoded in this process; with a process pool, warm_up never loaded
+            # the encoder here, and unpickling it (importing scikit-learn) would block the event loop
+            await run_in_threadpool(get_label_encoder)
+            app.state.models_error = None
+            app.state.models_ready = True
+            return
+        except Exception as e:
+            app.state.models_error = f"{type(e).__name__}: {e}"
+            logger.error(f"Model warm-up failed (attempt {attempt} of {WARM_UP_ATTEMPTS}): {str(e)}")
+            if attempt < WARM_UP_ATTEMPTS:
+                await asyncio.sleep(WARM_UP_RETRY_SECONDS)
+    app.state.models_failed = True
+
+async def seed_leaderboard():
+    try:
+        await load_leaderboard_index()
+    except Exception as e:
+        logger.error(f"Leaderboard seeding failed: {str(e)}")
+
+async def seed_nicknames():
+    try:
+        await load_nickname_registry()
+    except Exception as e:
+        logger.error(f"Nickname registry seeding failed: {str(e)}")
+
+async def resync_after_connect():
+    """Broadcasts from other workers are lost while the broker is unreachable, so reload
+    what they keep in step on every (re)connect"""
+    await seed_leaderboard()
+    await seed_nicknames()
+
+async def build_stats():
+    try:
+        if await stats_rollup.build_if_missing(get_async_db()):
+            logger.info("Stats rollup built for the first time")
+    except Exception as e:
+        logger.error(f"Stats rollup build failed: {str(e)}")
+
+async def load_levels():
+    try:
+        await level_cache.refresh()
+    except Exception as e:
+        logger.error(f"Level cache loading failed: {str(e)}")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Load models and seed caches in the background so /health answers meanwhile
+    app.state.models_ready = False
+    app.state.models_failed = False
+    app.state.models_error = None
+    background = [
+        asyncio.create_task(warm_up_models(app)),
+        asyncio.create_task(seed_leaderboard()),
+        asyncio.create_task(load_levels()),
+        asyncio.create_task(seed_nicknames()),
+        asyncio.create_task(build_stats())
+    ]
+    manager.backend.on_connect(resync_after_connect)
+    await manager.start()
+    yield
+    await manager.stop()
+    for task in background:
+        task.cancel()
+    await scheduler.stop()
+    inference_executor.shutdown()
+
+app = FastAPI(lifespan=lifespan)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -30,6 +122,31 @@ app.include_router(leaderboard_router, tags=["Leaderboard"])
 def health_check():
     return {"status": "healthy"}
 
+# Readiness for load balancers: not ready until the models are loaded and warmed
+@app.get("/ready")
+def readiness_check():
+    if app.state.models_failed:
+        return JSONResponse(status_code=503, content={"status": "failed", "error": app.state.models_error})
+    if not app.state.models_ready:
+        return JSONResponse(status_code=503, content={"status": "loading", "last_error": app.state.models_error})
+    return {"status": "ready"}
+
+@app.get("/metrics")
+def metrics():
+    counters = {
+        "inference_scheduler": scheduler.metrics(),
+        "inference_executor": inference_executor.metrics(),
+        "preprocess_buffers": buffer_pool.metrics(),
+        "prediction_cache": prediction_cache.metrics(),
+        "level_cache": level_cache.metrics(),
+        "login_cache": login_cache.metrics(),
+        "nickname_registry": nickname_registry.metrics(),
+        "websockets": manager.metrics()
+    }
+    if DATA_BACKEND == "memory":
+        counters["memory_backend"] = get_async_db().metrics()
+    return counters
+
 if __name__ == "__main__":
     import uvicorn
     port = int(os.getenv("PORT", 8000))
@@ -0,0 +1,614 @@
+import copy
+import itertools
+import logging
+import threading
+import uuid
+from datetime import datetime, timezone
+from functools import cmp_to_key
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from firebase_admin import _user_mgt, auth as firebase_auth
+from google.api_core.exceptions import Aborted, AlreadyExists, NotFound
+from google.cloud.firestore_v1 import transforms
+from google.cloud.firestore_v1.aggregation import AggregationResult
+
+from scripts.sync_content import DEFAULT_CONTENT, load_levels
+
+logger = logging.getLogger(__name__)
+
+# In-process stand-ins for the async Firestore client and Firebase Auth, selected with
+# DATA_BACKEND=memory so the whole API can be load-tested and profiled without a project.
+# They implement the part of each API this backend uses, with Firestore's semantics:
+# field paths, transforms, query filters/ordering/cursors, atomic batches and optimistic
+# transactions. Everything lives in this process and is lost on restart.
+
+DOCUMENT_ID = '__name__'
+
+def split_path(field_path: str) -> Tuple[str, ...]:
+    """'progress.levels.`1`.completed_at' -> ('progress', 'levels', '1', 'completed_at')"""
+    parts, current, quoted = [], '', False
+    for char in field_path:
+        if char == '`':
+            quoted = not quoted
+        elif char == '.' and not quoted:
+            parts.append(current)
+            current = ''
+        else:
+            current += char
+    parts.append(current)
+    return tuple(parts)
+
+def get_path(data: dict, parts: Tuple[str, ...]):
+    """(found, value) of a field inside a document"""
+    for part in parts:
+        if not isinstance(data, dict) or part not in data:
+            return False, None
+        data = data[part]
+    return True, data
+
+def set_path(data: dict, parts: Tuple[str, ...], value):
+    for part in parts[:-1]:
+        if not isinstance(data.get(part), dict):
+            data[part] = {}
+        data = data[part]
+    data[parts[-1]] = value
+
+def delete_path(data: dict, parts: Tuple[str, ...]):
+    found, parent = get_path(data, parts[:-1])
+    if found and isinstance(parent, dict):
+        parent.pop(parts[-1], None)
+
+def project(data: dict, field_paths: Iterable[str]) -> dict:
+    projected = {}
+    for field_path in field_paths:
+        parts = split_path(field_path)
+        found, value = get_path(data, parts)
+        if found:
+            set_path(projected, parts, copy.deepcopy(value))
+    return projected
+
+def type_rank(value) -> int:
+    # Firestore orders values of different types by type first
+    if value is None:
+        return 0
+    if isinstance(value, bool):
+        return 1
+    if isinstance(value, (int, float)):
+        return 2
+    if isinstance(value, datetime):
+        return 3
+    if isinstance(value, str):
+        return 4
+    if isinstance(value, bytes):
+        return 5
+    if isinstance(value, list):
+        return 8
+    return 9
+
+def compare_values(a, b) -> int:
+    rank_a, rank_b = type_rank(a), type_rank(b)
+    if rank_a != rank_b:
+        return -1 if rank_a < rank_b else 1
+    if isinstance(a, list):
+        for item_a, item_b in zip(a, b):
+            result = compare_values(item_a, item_b)
+            if result:
+                return result
+        return (len(a) > len(b)) - (len(a) < len(b))
+    if isinstance(a, dict):
+        a, b = sorted(a.items(), key=str), sorted(b.items(), key=str)
+        return (str(a) > str(b)) - (str(a) < str(b))
+    return (a > b) - (a < b)
+
+def matches(value, op: str, operand) -> bool:
+    if op == '==':
+        return compare_values(value, operand) == 0
+    if op == '!=':
+        return value is not None and compare_values(value, operand) != 0
+    if op in ('<', '<=', '>', '>='):
+        # Range filters only match values of the operand's type
+        if type_rank(value) != type_rank(operand):
+            return False
+        result = compare_values(value, operand)
+        return {'<': result < 0, '<=': result <= 0, '>': result > 0, '>=': result >= 0}[op]
+    if op == 'in':
+        return any(compare_values(value, item) == 0 for item in operand)
+    if op == 'not-in':
+        return value is not None and all(compare_values(value, item) != 0 for item in operand)
+    if op == 'array-contains':
+        return isinstance(value, list) and any(compare_values(item, operand) == 0 for item in value)
+    if op == 'array-contains-any':
+        return isinstance(value, list) and any(compare_values(item, other) == 0 for item in value for other in operand)
+    raise ValueError(f"Unsupported filter operator: {op}")
+
+def resolve(value):
+    """A value about to be stored, with sentinels inside maps and arrays replaced"""
+    if isinstance(value, dict):
+        return {key: resolve(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [resolve(item) for item in value]
+    if value is transforms.SERVER_TIMESTAMP:
+        return datetime.now(timezone.utc)
+    if isinstance(value, (transforms.Increment, transforms.Maximum, transforms.Minimum)):
+        return value.value
+    if isinstance(value, transforms.ArrayUnion):
+        return list(value.values)
+    if isinstance(value, transforms.ArrayRemove):
+        return []
+    return copy.deepcopy(value)
+
+def write_field(data: dict, parts: Tuple[str, ...], value):
+    """Store one field, applying a transform to what is there"""
+    if value is transforms.DELETE_FIELD:
+        delete_path(data, parts)
+        return
+    found, current = get_path(data, parts)
+    if isinstance(value, transforms.Increment):
+        value = current + value.value if found and type_rank(current) == 2 and not isinstance(current, bool) else value.value
+    elif isinstance(value, transforms.Maximum):
+        value = max(current, value.value) if found and type_rank(current) == 2 else value.value
+    elif isinstance(value, transforms.Minimum):
+        value = min(current, value.value) if found and type_rank(current) == 2 else value.value
+    elif isinstance(value, transforms.ArrayUnion):
+        items = list(current) if found and isinstance(current, list) else []
+        value = items + [item for item in value.values if item not in items]
+    elif isinstance(value, transforms.ArrayRemove):
+        items = list(current) if found and isinstance(current, list) else []
+        value = [item for item in items if item not in value.values]
+    else:
+        value = resolve(value)
+    set_path(data, parts, value)
+
+def merge_fields(data: dict, changes: dict, prefix: Tuple[str, ...] = ()):
+    # set(merge=True) and set() both treat nested maps as field paths
+    for key, value in changes.items():
+        parts = prefix + (key,)
+        if isinstance(value, dict) and value:
+            merge_fields(data, value, parts)
+        else:
+            write_field(data, parts, value)
+
+class MemorySnapshot:
+    def __init__(self, reference: 'MemoryDocumentReference', data: Optional[dict]):
+        self.reference = reference
+        self._data = data
+
+    @property
+    def id(self) -> str:
+        return self.reference.id
+
+    @property
+    def exists(self) -> bool:
+        return self._data is not None
+
+    def to_dict(self) -> Optional[dict]:
+        return copy.deepcopy(self._data)
+
+    def get(self, field_path: str):
+        found, value = get_path(self._data or {}, split_path(field_path))
+        if not found:
+            raise KeyError(field_path)
+        return copy.deepcopy(value)
+
+class MemoryDocumentReference:
+    def __init__(self, client: 'MemoryClient', collection: str, document_id: str):
+        self._client = client
+        self._collection = collection
+        self.id = document_id
+
+    @property
+    def path(self) -> str:
+        return f'{self._collection}/{self.id}'
+
+    def __eq__(self, other):
+        return isinstance(other, MemoryDocumentReference) and other.path == self.path
+
+    def __hash__(self):
+        return hash(self.path)
+
+    async def get(self, field_paths: Optional[List[str]] = None, transaction: Optional['MemoryTransaction'] = None) -> MemorySnapshot:
+        return self._client._read(self, field_paths, transaction)
+
+    async def create(self, document_data: dict):
+        self._client._commit([('create', self, document_data, False)])
+
+    async def set(self, document_data: dict, merge: bool = False):
+        self._client._commit([('set', self, document_data, merge)])
+
+    async def update(self, field_updates: dict):
+        self._client._commit([('update', self, field_updates, False)])
+
+    async def delete(self):
+        self._client._commit([('delete', self, None, False)])
+
+class MemoryAggregationQuery:
+    def __init__(self, query: 'MemoryQuery'):
+        self._query = query
+
+    async def get(self) -> List[List[AggregationResult]]:
+        count = len(self._query._client._run(self._query))
+        return [[AggregationResult(alias='count', value=count)]]
+
+class MemoryQuery:
+    def __init__(self, client: 'MemoryClient', collection: str):
+        self._client = client
+        self._collection = collection
+        self._filters: List[Tuple[Tuple[str, ...], str, object]] = []
+        self._orders: List[Tuple[Tuple[str, ...], str]] = []
+        self._limit: Optional[int] = None
+        self._offset = 0
+        self._projection: Optional[List[str]] = None
+        self._start_after = None
+
+    def _copy(self, **changes) -> 'MemoryQuery':
+        query = copy.copy(self)
+        query._filters, query._orders = list(self._filters), list(self._orders)
+        query.__dict__.update(changes)
+        return query
+
+    def where(self, field_path: Optional[str] = None, op_string: Optional[str] = None, value=None, *, filter=None) -> 'MemoryQuery':
+        if filter is not None:
+            field_path, op_string, value = filter.field_path, filter.op_string, filter.value
+        query = self._copy()
+        query._filters.append((split_path(field_path), op_string, value))
+        return query
+
+    def order_by(self, field_path: str, direction: str = 'ASCENDING') -> 'MemoryQuery':
+        query = self._copy()
+        query._orders.append((split_path(field_path), direction))
+        return query
+
+    def limit(self, count: int) -> 'MemoryQuery':
+        return self._copy(_limit=count)
+
+    def offset(self, num_to_skip: int) -> 'MemoryQuery':
+        return self._copy(_offset=num_to_skip)
+
+    def select(self, field_paths: Iterable[str]) -> 'MemoryQuery':
+        return self._copy(_projection=list(field_paths))
+
+    def start_after(self, document_fields) -> 'MemoryQuery':
+        return self._copy(_start_after=document_fields)
+
+    def count(self, alias: Optional[str] = None) -> MemoryAggregationQuery:
+        return MemoryAggregationQuery(self)
+
+    async def get(self, transaction: Optional['MemoryTransaction'] = None) -> List[MemorySnapshot]:
+        return self._client._run(self)
+
+    async def stream(self, transaction: Optional['MemoryTransaction'] = None):
+        for snapshot in self._client._run(self):
+            yield snapshot
+
+class MemoryCollection(MemoryQuery):
+    @property
+    def id(self) -> str:
+        return self._collection
+
+    def document(self, document_id: Optional[str] = None) -> MemoryDocumentReference:
+        return MemoryDocumentReference(self._client, self._collection, document_id or uuid.uuid4().hex[:20])
+
+class MemoryWriteBatch:
+    def __init__(self, client: 'MemoryClient'):
+        self._client = client
+        self._writes: List[tuple] = []
+
+    def __len__(self):
+        return len(self._writes)
+
+    def create(self, reference: MemoryDocumentReference, document_data: dict):
+        self._writes.append(('create', reference, document_data, False))
+
+    def set(self, reference: MemoryDocumentReference, document_data: dict, merge: bool = False):
+        self._writes.append(('set', reference, document_data, merge))
+
+    def update(self, reference: MemoryDocumentReference, field_updates: dict):
+        self._writes.append(('update', reference, field_updates, False))
+
+    def delete(self, reference: MemoryDocumentReference):
+        self._writes.append(('delete', reference, None, False))
+
+    async def commit(self):
+        self._client._commit(self._writes)
+        return []
+
+class MemoryTransaction(MemoryWriteBatch):
+    """Optimistic, like Firestore's: commit aborts if a document read in the transaction
+    changed meanwhile, and firestore.async_transactional retries the function.
+
+    async_transactional drives the private methods below, as of the google-cloud-firestore
+    version pinned in requirements.txt; scripts/check_memory_backend.py verifies them."""
+
+    def __init__(self, client: 'MemoryClient', max_attempts: int = 5, read_only: bool = False):
+        super().__init__(client)
+        self._max_attempts = max_attempts
+        self._read_only = read_only
+        self._id = None
+        self._read_versions: Dict[str, int] = {}
+
+    @property
+    def in_progress(self) -> bool:
+        return self._id is not None
+
+    def _clean_up(self):
+        self._writes = []
+        self._read_versions = {}
+        self._id = None
+
+    async def _begin(self, retry_id=None):
+        self._id = uuid.uuid4().bytes
+
+    async def _rollback(self):
+        self._clean_up()
+
+    async def _commit(self):
+        try:
+            self._client._commit(self._writes, self._read_versions)
+            return []
+        finally:
+            self._clean_up()
+
+class MemoryClient:
+    """Thread-safe in-memory document store with the async Firestore client's interface"""
+
+    def __init__(self):
+        # collection -> document id -> (version, data)
+        self._collections: Dict[str, Dict[str, Tuple[int, dict]]] = {}
+        self._lock = threading.RLock()
+        self._versions = itertools.count(1)
+        self._reads = 0
+        self._writes = 0
+        self._commits = 0
+        self._aborts = 0
+
+    def collection(self, collection_id: str) -> MemoryCollection:
+        return MemoryCollection(self, collection_id)
+
+    def document(self, document_path: str) -> MemoryDocumentReference:
+        collection_id, document_id = document_path.split('/')
+        return MemoryDocumentReference(self, collection_id, document_id)
+
+    def batch(self) -> MemoryWriteBatch:
+        return MemoryWriteBatch(self)
+
+    def transaction(self, max_attempts: int = 5, read_only: bool = False) -> MemoryTransaction:
+        return MemoryTransaction(self, max_attempts=max_attempts, read_only=read_only)
+
+    async def get_all(self, references: Iterable[MemoryDocumentReference], field_paths: Optional[List[str]] = None,
+                      transaction: Optional[MemoryTransaction] = None):
+        for reference in references:
+            yield self._read(reference, field_paths, transaction)
+
+    def _read(self, reference: MemoryDocumentReference, field_paths: Optional[List[str]],
+              transaction: Optional[MemoryTransaction]) -> MemorySnapshot:
+        with self._lock:
+            self._reads += 1
+            entry = self._collections.get(reference._collection, {}).get(reference.id)
+            if transaction is not None:
+                transaction._read_versions[reference.path] = entry[0] if entry else 0
+            if entry is None:
+                return MemorySnapshot(reference, None)
+            data = project(entry[1], field_paths) if field_paths is not None else copy.deepcopy(entry[1])
+        return MemorySnapshot(reference, data)
+
+    def _run(self, query: MemoryQuery) -> List[MemorySnapshot]:
+        with self._lock:
+            documents = [(document_id, entry[1]) for document_id, entry in self._collections.get(query._collection, {}).items()]
+
+            def field(data: dict, document_id: str, parts: Tuple[str, ...]):
+                if parts == (DOCUMENT_ID,):
+                    return True, document_id
+                return get_path(data, parts)
+
+            for parts, op, operand in query._filters:
+                kept = []
+                for document_id, data in documents:
+                    found, value = field(data, document_id, parts)
+                    if found and matches(value, op, operand):
+                        kept.append((document_id, data))
+                documents = kept
+
+            # Firestore orders by an inequality field first, then by document id,
+            # and leaves out documents missing an ordered field
+            orders = list(query._orders)
+            ordered = {parts for parts, _ in orders}
+            for parts, op, _ in query._filters:
+                if op in ('<', '<=', '>', '>=', '!=', 'not-in') and parts not in ordered:
+                    orders.insert(0, (parts, 'ASCENDING'))
+                    ordered.add(parts)
+            if (DOCUMENT_ID,) not in ordered:
+                orders.append(((DOCUMENT_ID,), orders[-1][1] if orders else 'ASCENDING'))
+            documents = [
+                (document_id, data) for document_id, data in documents
+                if all(field(data, document_id, parts)[0] for parts, _ in orders)
+            ]
+
+            def key(document_id: str, data: dict) -> list:
+                return [field(data, document_id, parts)[1] for parts, _ in orders]
+
+            def compare(a: list, b: list) -> int:
+                for (_, direction), value_a, value_b in zip(orders, a, b):
+                    result = compare_values(value_a, value_b)
+                    if result:
+                        return -result if direction == 'DESCENDING' else result
+                return 0
+
+            keyed = sorted(((key(document_id, data), document_id, data) for document_id, data in documents),
+                           key=cmp_to_key(lambda a, b: compare(a[0], b[0])))
+
+            if query._start_after is not None:
+                cursor = query._start_after
+                if isinstance(cursor, MemorySnapshot):
+                    cursor_data, cursor_id = cursor._data or {}, cursor.id
+                else:
+                    cursor_data, cursor_id = cursor, cursor.get(DOCUMENT_ID)
+                cursor_key = [
+                    cursor_id if parts == (DOCUMENT_ID,) else get_path(cursor_data, parts)[1]
+                    for parts, _ in orders
+                ]
+                keyed = [entry for entry in keyed if compare(entry[0], cursor_key) > 0]
+
+            keyed = keyed[query._offset:]
+            if query._limit is not None:
+                keyed = keyed[:query._limit]
+            self._reads += max(len(keyed), 1)
+            projection = query._projection
+            results = [
+                (document_id, project(data, projection) if projection is not None else copy.deepcopy(data))
+                for _, document_id, data in keyed
+            ]
+        collection = self.collection(query._collection)
+        return [MemorySnapshot(collection.document(document_id), data) for document_id, data in results]
+
+    def _commit(self, writes: List[tuple], read_versions: Optional[Dict[str, int]] = None):
+        """Apply writes atomically: all of them or, on a failed precondition, none"""
+        with self._lock:
+            for path, version in (read_versions or {}).items():
+                collection_id, document_id = path.split('/')
+                entry = self._collections.get(collection_id, {}).get(document_id)
+                if (entry[0] if entry else 0) != version:
+                    self._aborts += 1
+                    raise Aborted(f"Transaction lost a race on {path}; it will be retried")
+
+            staged: Dict[MemoryDocumentReference, Optional[dict]] = {}
+            for op, reference, data, merge in writes:
+                if reference in staged:
+                    current = staged[reference]
+                else:
+                    entry = self._collections.get(reference._collection, {}).get(reference.id)
+                    current = copy.deepcopy(entry[1]) if entry else None
+                if op == 'create':
+                    if current is not None:
+                        raise AlreadyExists(f"Document already exists: {reference.path}")
+                    current = {}
+                    merge_fields(current, data)
+                elif op == 'set':
+                    current = current if merge and current is not None else {}
+                    merge_fields(current, data)
+                elif op == 'update':
+                    if current is None:
+                        raise NotFound(f"No document to update: {reference.path}")
+                    for field_path, value in data.items():
+                        write_field(current, split_path(field_path), value)
+                else:
+                    current = None
+                staged[reference] = current
+
+            for reference, data in staged.items():
+                collection = self._collections.setdefault(reference._collection, {})
+                if data is None:
+                    collection.pop(reference.id, None)
+                else:
+                    collection[reference.id] = (next(self._versions), data)
+            self._writes += len(writes)
+            self._commits += 1
+
+    def metrics(self) -> dict:
+        with self._lock:
+            return {
+                "documents": {name: len(documents) for name, documents in self._collections.items()},
+                "reads": self._reads,
+                "writes": self._writes,
+                "commits": self._commits,
+                "aborted_transactions": self._aborts,
+            }
+
+class MemoryAuth:
+    """Firebase Auth user management in memory; passwords are accepted but not kept,
+    since sign-in itself happens on the client"""
+
+    # Plain value classes are shared with the real SDK
+    EmailIdentifier = firebase_auth.EmailIdentifier
+    UidIdentifier = firebase_auth.UidIdentifier
+    ImportUserRecord = firebase_auth.ImportUserRecord
+    UserImportHash = firebase_auth.UserImportHash
+    UserNotFoundError = firebase_auth.UserNotFoundError
+    EmailAlreadyExistsError = firebase_auth.EmailAlreadyExistsError
+    UidAlreadyExistsError = firebase_auth.UidAlreadyExistsError
+
+    def __init__(self):
+        self._users: Dict[str, firebase_auth.UserRecord] = {}
+        self._uids_by_email: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    def _add(self, uid: str, email: Optional[str]) -> firebase_auth.UserRecord:
+        # Callers hold the lock
+        if uid in self._users:
+            raise firebase_auth.UidAlreadyExistsError(f"The user with the provided uid already exists: {uid}", None, None)
+        if email and email.lower() in self._uids_by_email:
+            raise firebase_auth.EmailAlreadyExistsError(f"The user with the provided email already exists: {email}", None, None)
+        user = firebase_auth.UserRecord({'localId': uid, 'email': email})
+        self._users[uid] = user
+        if email:
+            self._uids_by_email[email.lower()] = uid
+        return user
+
+    def _remove(self, uid: str) -> bool:
+        user = self._users.pop(uid, None)
+        if user is not None and user.email:
+            self._uids_by_email.pop(user.email.lower(), None)
+        return user is not None
+
+    def create_user(self, uid: Optional[str] = None, email: Optional[str] = None, password: Optional[str] = None, **kwargs):
+        with self._lock:
+            return self._add(uid or uuid.uuid4().hex[:28], email)
+
+    def get_user(self, uid: str):
+        with self._lock:
+            if uid not in self._users:
+                raise firebase_auth.UserNotFoundError(f"No user record found for the provided user ID: {uid}")
+            return self._users[uid]
+
+    def get_user_by_email(self, email: str):
+        with self._lock:
+            uid = self._uids_by_email.get(email.lower())
+            if uid is None:
+                raise firebase_auth.UserNotFoundError(f"No user record found for the provided email: {email}")
+            return self._users[uid]
+
+    def get_users(self, identifiers: list):
+        with self._lock:
+            users, not_found = [], []
+            for identifier in identifiers:
+                if isinstance(identifier, firebase_auth.EmailIdentifier):
+                    uid = self._uids_by_email.get(identifier.email.lower())
+                else:
+                    uid = identifier.uid
+                if uid in self._users:
+                    users.append(self._users[uid])
+                else:
+                    not_found.append(identifier)
+            return firebase_auth.GetUsersResult(users, not_found)
+
+    def delete_user(self, uid: str):
+        with self._lock:
+            if not self._remove(uid):
+                raise firebase_auth.UserNotFoundError(f"No user record found for the provided user ID: {uid}")
+
+    def delete_users(self, uids: List[str]):
+        # Like Firebase, unknown uids count as deleted
+        with self._lock:
+            for uid in uids:
+                self._remove(uid)
+        return firebase_auth.DeleteUsersResult(_user_mgt.BatchDeleteAccountsResponse(), len(uids))
+
+    def import_users(self, users: list, hash_alg=None):
+        errors = []
+        with self._lock:
+            for index, user in enumerate(users):
+                try:
+                    self._add(user.uid, user.email)
+                except (firebase_auth.UidAlreadyExistsError, firebase_auth.EmailAlreadyExistsError) as e:
+                    errors.append({'index': index, 'message': str(e)})
+        return firebase_auth.UserImportResult({'error': errors}, len(users))
+
+def seed_levels(client: MemoryClient, path: str = DEFAULT_CONTENT):
+    """Start with the level content a real deployment syncs from the same file"""
+    levels = load_levels(path)
+    client._commit([('set', client.collection('levels').document(level_id), level, False) for level_id, level in levels.items()])
+    logger.info(f"In-memory backend seeded with {len(levels)} levels from {path}")
+
+# Global in-memory backend instances, created on first use by config
+memory_db = MemoryClient()
+seed_levels(memory_db)
+memory_auth = MemoryAuth()
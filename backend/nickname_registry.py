@@ -0,0 +1,93 @@
+import logging
+import unicodedata
+from typing import Iterable, List, Set
+from urllib.parse import quote
+
+logger = logging.getLogger(__name__)
+
+# One document per taken nickname, keyed by its normalized form. Signup creates it with
+# create() in the same batch as the student document, so two signups racing for the
+# same nickname cannot both commit.
+NICKNAMES_COLLECTION = 'nicknames'
+# scripts/backfill_nicknames.py writes this once every student who signed up before
+# reservations has one; until then nicknames are also looked up in the students collection
+MIGRATIONS_COLLECTION = 'migrations'
+BACKFILL_DOCUMENT = 'nickname_reservations'
+# Firestore 'in' filters take at most 30 values
+IN_FILTER_LIMIT = 30
+
+def normalize_nickname(nickname: str) -> str:
+    """Nicknames are unique regardless of case, width and surrounding spaces"""
+    return unicodedata.normalize('NFKC', nickname).strip().casefold()
+
+def reservation_id(nickname: str) -> str:
+    key = quote(normalize_nickname(nickname), safe='')
+    # Firestore rejects ".", ".." and "__*__" as ids; '%' is always escaped by quote(),
+    # so escaping every character of those keeps ids unique
+    if key in ('.', '..') or (key.startswith('__') and key.endswith('__')):
+        key = ''.join(f'%{ord(char):02X}' for char in key)
+    return key
+
+def reservation_ref(db, nickname: str):
+    return db.collection(NICKNAMES_COLLECTION).document(reservation_id(nickname))
+
+def backfill_ref(db):
+    return db.collection(MIGRATIONS_COLLECTION).document(BACKFILL_DOCUMENT)
+
+class NicknameRegistry:
+    """In-memory set of taken nicknames, so obvious duplicates are rejected without a read.
+
+    A nickname missing here (taken on another worker) is still caught by the reservation's
+    create() when the signup commits. Nicknames freed on any worker are discarded here
+    through the students_removed broadcast (websocket_manager). Used from the event loop only.
+    """
+
+    def __init__(self):
+        self._taken = set()
+        self.ready = False
+        self._rejected = 0
+        # Whether every pre-existing student has a reservation (see BACKFILL_DOCUMENT)
+        self.backfilled = False
+
+    def seed(self, reservation_ids: Iterable[str]):
+        # Replaces rather than adds, so nicknames freed while broadcasts were missed are released
+        self._taken = set(reservation_ids)
+        self.ready = True
+        logger.info(f"Nickname registry seeded with {len(self._taken)} nicknames")
+
+    def is_taken(self, nickname: str) -> bool:
+        taken = reservation_id(nickname) in self._taken
+        if taken:
+            self._rejected += 1
+        return taken
+
+    async def taken_without_reservation(self, db, nicknames: List[str]) -> Set[str]:
+        """Of `nicknames`, those held by students who predate reservations; always empty
+        once the backfill has run. Matches exactly, as signup did before reservations."""
+        if not self.backfilled:
+            self.backfilled = (await backfill_ref(db).get()).exists
+        if self.backfilled or not nicknames:
+            return set()
+        taken = set()
+        for start in range(0, len(nicknames), IN_FILTER_LIMIT):
+            chunk = nicknames[start:start + IN_FILTER_LIMIT]
+            students = await db.collection('students').where('nickname', 'in', chunk).select(['nickname']).get()
+            taken.update(student.to_dict().get('nickname') for student in students)
+        return taken
+
+    def add(self, nickname: str):
+        self._taken.add(reservation_id(nickname))
+
+    def discard(self, nickname: str):
+        self._taken.discard(reservation_id(nickname))
+
+    def metrics(self) -> dict:
+        return {
+            "ready": self.ready,
+            "nicknames": len(self._taken),
+            "rejected_without_read": self._rejected,
+            "backfilled": self.backfilled,
+        }
+
+# Global nickname registry instance
+nickname_registry = NicknameRegistry()
@@ -0,0 +1,74 @@
+import hashlib
+import logging
+import sys
+from collections import OrderedDict
+from typing import Optional
+
+import numpy as np
+
+from config import PREDICTION_CACHE_MAX_BYTES
+
+logger = logging.getLogger(__name__)
+
+class PredictionCache:
+    """LRU of per-character probability vectors keyed by a hash of the normalized 32x32 tensor.
+
+    Only used from the event loop, so it needs no locking.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[bytes, np.ndarray]" = OrderedDict()
+        self._bytes = 0
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    @staticmethod
+    def key(character: np.ndarray) -> bytes:
+        return hashlib.blake2b(np.ascontiguousarray(character).tobytes(), digest_size=16).digest()
+
+    @staticmethod
+    def _entry_size(key: bytes, probs: np.ndarray) -> int:
+        return sys.getsizeof(key) + sys.getsizeof(probs)
+
+    def get(self, key: bytes) -> Optional[np.ndarray]:
+        probs = self._entries.get(key)
+        if probs is None:
+            self._misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self._hits += 1
+        return probs
+
+    def put(self, key: bytes, probs: np.ndarray):
+        if self.max_bytes <= 0 or key in self._entries:
+            return
+        # Own a compact copy rather than a view that keeps the whole batch alive
+        probs = np.array(probs, copy=True)
+        self._entries[key] = probs
+        self._bytes += self._entry_size(key, probs)
+
+        while self._bytes > self.max_bytes and self._entries:
+            old_key, old_probs = self._entries.popitem(last=False)
+            self._bytes -= self._entry_size(old_key, old_probs)
+            self._evictions += 1
+
+    def clear(self):
+        self._entries.clear()
+        self._bytes = 0
+
+    def metrics(self) -> dict:
+        lookups = self._hits + self._misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self._hits,
+            "misses": self._misses,
+            "hit_rate": self._hits / lookups if lookups else 0.0,
+            "evictions": self._evictions,
+        }
+
+# Global prediction cache instance
+prediction_cache = PredictionCache(PREDICTION_CACHE_MAX_BYTES)
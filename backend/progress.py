@@ -0,0 +1,86 @@
+from datetime import datetime
+from firebase_admin import firestore
+import stats_rollup
+
+# Stars needed on a level before the next one unlocks
+STARS_TO_COMPLETE_LEVEL = 2
+
+class StudentNotFound(Exception):
+    pass
+
+class LevelNotUnlocked(Exception):
+    pass
+
+def new_level_progress(level_id: int, is_unlocked: bool = True) -> dict:
+    return {
+        'level_id': level_id,
+        'stars_earned': 0,
+        'tasks_completed': [],
+        'is_unlocked': is_unlocked,
+        'completed_at': None
+    }
+
+@firestore.async_transactional
+async def _award_task(transaction, db, student_uid: str, level_id: int, task_id: int) -> dict:
+    student_ref = db.collection('students').document(student_uid)
+    student_doc = await student_ref.get(transaction=transaction)
+    if not student_doc.exists:
+        raise StudentNotFound("Student not found")
+
+    student_data = student_doc.to_dict()
+    progress = student_data.get('progress', {})
+    levels = progress.get('levels', {})
+    level_key = str(level_id)
+    if level_key not in levels:
+        raise LevelNotUnlocked("Level not unlocked")
+
+    level_progress = levels[level_key]
+    total_stars = progress.get('total_stars', 0)
+    result = {
+        'nickname': student_data.get('nickname', 'Unknown'),
+        'updated': False,
+        'stars_earned': level_progress.get('stars_earned', 0),
+        'total_stars': total_stars,
+        'level_completed': level_progress.get('stars_earned', 0) >= STARS_TO_COMPLETE_LEVEL,
+        'next_level_unlocked': False
+    }
+    if task_id in level_progress.get('tasks_completed', []):
+        return result
+
+    # Only the touched fields are sent; the transaction retries if the student changed meanwhile
+    level_path = f'progress.levels.{level_key}'
+    changes = {
+        f'{level_path}.tasks_completed': firestore.ArrayUnion([task_id]),
+        f'{level_path}.stars_earned': firestore.Increment(1),
+        'progress.total_stars': firestore.Increment(1)
+    }
+    result.update({
+        'updated': True,
+        'stars_earned': result['stars_earned'] + 1,
+        'total_stars': total_stars + 1
+    })
+
+    newly_completed = None
+    if result['stars_earned'] >= STARS_TO_COMPLETE_LEVEL:
+        result['level_completed'] = True
+        if not level_progress.get('completed_at'):
+            changes[f'{level_path}.completed_at'] = datetime.utcnow().isoformat()
+            newly_completed = level_id
+        next_key = str(level_id + 1)
+        if next_key not in levels:
+            changes[f'progress.levels.{next_key}'] = new_level_progress(level_id + 1)
+            changes['progress.current_level'] = level_id + 1
+            result['next_level_unlocked'] = True
+
+    transaction.update(student_ref, changes)
+    stats_rollup.record(db, stats_rollup.stars_awarded(total_stars, total_stars + 1, newly_completed), transaction)
+    return result
+
+async def award_task(db, student_uid: str, level_id: int, task_id: int) -> dict:
+    """Mark a task completed and award its star in one transaction.
+
+    Returns the student's nickname, whether anything changed, the level's stars and the
+    new total, and whether the level is completed and the next one was unlocked.
+    Raises StudentNotFound or LevelNotUnlocked.
+    """
+    return await _award_task(db.transaction(), db, student_uid, level_id, task_id)
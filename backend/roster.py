@@ -0,0 +1,341 @@
+import asyncio
+import csv
+import hashlib
+import io
+import json
+import os
+import uuid
+from typing import Dict, List, Optional, Tuple
+
+from fastapi.concurrency import run_in_threadpool
+from firebase_admin import firestore
+from google.api_core.exceptions import AlreadyExists
+
+from config import BULK_IMPORT_PBKDF2_ROUNDS, get_auth
+from websocket_manager import manager
+from login_cache import login_cache
+from nickname_registry import nickname_registry, normalize_nickname, reservation_ref
+from progress import new_level_progress
+import stats_rollup
+
+auth = get_auth()
+
+MAX_ROSTER_ROWS = 1000
+# Firebase Admin SDK limits per call
+AUTH_LOOKUP_LIMIT = 100
+AUTH_BULK_LIMIT = 1000
+# Firestore allows 500 writes per batch or transaction: two per student plus one for the stats rollup
+STUDENTS_PER_BATCH = (500 - 1) // 2
+# Firebase requires passwords of at least six characters
+MIN_PASSWORD_LENGTH = 6
+# Passwords hashed per threadpool job; pbkdf2_hmac releases the GIL, so jobs run in parallel
+HASH_CHUNK_SIZE = 50
+
+class RosterError(Exception):
+    pass
+
+def chunks(items: list, size: int) -> List[list]:
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+def parse_row(row: dict, fields: Tuple[str, ...]) -> dict:
+    """`fields` of one roster row as stripped text; a row holding anything but text or a
+    number (e.g. a nested object) gets an 'error' instead of failing the whole roster"""
+    parsed = {}
+    for field in fields:
+        value = row.get(field)
+        if isinstance(value, str):
+            parsed[field] = value.strip()
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            parsed[field] = str(value)
+        else:
+            parsed[field] = ''
+            if value is not None and 'error' not in parsed:
+                parsed['error'] = f"{field} must be text or a number"
+    return parsed
+
+def parse_roster(body: bytes, content_type: str, fields: Tuple[str, ...]) -> List[dict]:
+    """Rows of a CSV (with a header line) or JSON roster, keeping only `fields`.
+
+    JSON may be a list of objects, a list of plain values for a single field, or an
+    object holding that list under "students" or "uids". Rows with unusable values
+    carry an 'error' to be reported for that row.
+    """
+    try:
+        text = body.decode('utf-8-sig')
+        if 'json' in content_type:
+            data = json.loads(text)
+            if isinstance(data, dict):
+                data = data.get('students', data.get('uids'))
+            if not isinstance(data, list):
+                raise RosterError("JSON roster must be a list of rows")
+            rows = [row if isinstance(row, dict) else {fields[0]: row} for row in data]
+        elif 'csv' in content_type:
+            rows = list(csv.DictReader(io.StringIO(text)))
+        else:
+            raise RosterError("Roster must be CSV or JSON")
+    except (UnicodeDecodeError, json.JSONDecodeError, csv.Error) as e:
+        raise RosterError(f"Could not read roster: {e}")
+
+    if len(rows) > MAX_ROSTER_ROWS:
+        raise RosterError(f"Roster has {len(rows)} rows; the limit is {MAX_ROSTER_ROWS}")
+    return [parse_row(row, fields) for row in rows]
+
+def valid_email(email: str) -> bool:
+    try:
+        auth.EmailIdentifier(email)
+        return True
+    except ValueError:
+        return False
+
+def hash_passwords(passwords: List[str], rounds: int) -> List[Tuple[bytes, bytes]]:
+    """PBKDF2-SHA256 hashes as Firebase import expects them; runs in the threadpool"""
+    hashed = []
+    for password in passwords:
+        salt = os.urandom(16)
+        hashed.append((hashlib.pbkdf2_hmac('sha256', password.encode(), salt, rounds), salt))
+    return hashed
+
+async def existing_emails(emails: List[str]) -> set:
+    lookups = await asyncio.gather(*(
+        run_in_threadpool(auth.get_users, [auth.EmailIdentifier(email) for email in chunk])
+        for chunk in chunks(emails, AUTH_LOOKUP_LIMIT)
+    ))
+    return {user.email.lower() for result in lookups for user in result.users if user.email}
+
+async def existing_document_ids(db, refs) -> set:
+    return {snapshot.id async for snapshot in db.get_all(refs) if snapshot.exists}
+
+async def delete_auth_users(uids: List[str]) -> Dict[str, str]:
+    """Delete Auth accounts in bulk; returns uid -> reason for the ones that failed"""
+    failures = {}
+    for chunk in chunks(uids, AUTH_BULK_LIMIT):
+        result = await run_in_threadpool(auth.delete_users, chunk)
+        for error in result.errors:
+            failures[chunk[error.index]] = error.reason
+    return failures
+
+async def commit_enrollments(db, students: List[dict]) -> Dict[str, str]:
+    """Write one batch of students with their nickname reservations; uid -> error for rows not saved.
+
+    If another signup took a nickname since the pre-check, the batch fails as a whole,
+    so it is retried once without the rows whose reservation now exists.
+    """
+    failures = {}
+    for attempt in range(2):
+        batch = db.batch()
+        for student in students:
+            batch.create(reservation_ref(db, student['nickname']), {
+                'uid': student['uid'],
+                'nickname': student['nickname']
+            })
+            batch.set(db.collection('students').document(student['uid']), {
+                'sid': student['sid'],
+                'email': student['email'],
+                'nickname': student['nickname'],
+                'type': 'student',
+                'progress': {
+                    'current_level': 1,
+                    'total_stars': 0,
+                    'levels': {'1': new_level_progress(1)}
+                }
+            })
+        stats_rollup.record(db, stats_rollup.student_added(len(students)), batch)
+        try:
+            await batch.commit()
+            return failures
+        except AlreadyExists as e:
+            if attempt:
+                failures.update({student['uid']: str(e) for student in students})
+                return failures
+            refs = [reservation_ref(db, student['nickname']) for student in students]
+            taken = await existing_document_ids(db, refs)
+            failures.update({
+                student['uid']: "Nickname already exists"
+                for student, ref in zip(students, refs) if ref.id in taken
+            })
+            students = [student for student in students if student['uid'] not in failures]
+            if not students:
+                return failures
+        except Exception as e:
+            failures.update({student['uid']: str(e) for student in students})
+            return failures
+    return failures
+
+async def enroll_students(db, rows: List[dict]) -> List[dict]:
+    """Create Auth accounts and student documents for every valid row; one result per row"""
+    results = [{'row': i + 1, 'email': row['email'], 'nickname': row['nickname']} for i, row in enumerate(rows)]
+    candidates = []
+    seen_emails, seen_nicknames = set(), set()
+
+    for result, row in zip(results, rows):
+        email, nickname = row['email'].lower(), normalize_nickname(row['nickname'])
+        if row.get('error'):
+            error = row['error']
+        elif not email or not nickname:
+            error = "email and nickname are required"
+        elif not valid_email(row['email']):
+            error = "Invalid email"
+        elif len(row['password']) < MIN_PASSWORD_LENGTH:
+            error = f"Password must be at least {MIN_PASSWORD_LENGTH} characters"
+        elif email in seen_emails:
+            error = "Email appears more than once in the roster"
+        elif nickname in seen_nicknames:
+            error = "Nickname appears more than once in the roster"
+        elif nickname_registry.is_taken(row['nickname']):
+            error = "Nickname already exists"
+        else:
+            seen_emails.add(email)
+            seen_nicknames.add(nickname)
+            candidates.append((result, row))
+            continue
+        result.update(status='error', error=error)
+
+    # Authoritative checks, one round trip each: reserved nicknames and registered emails
+    # (plus unreserved nicknames of older students, until the backfill has run)
+    if candidates:
+        refs = [reservation_ref(db, row['nickname']) for _, row in candidates]
+        reserved_ids, registered, unreserved = await asyncio.gather(
+            existing_document_ids(db, refs),
+            existing_emails([row['email'] for _, row in candidates]),
+            nickname_registry.taken_without_reservation(db, [row['nickname'] for _, row in candidates])
+        )
+        remaining = []
+        for (result, row), ref in zip(candidates, refs):
+            if ref.id in reserved_ids:
+                nickname_registry.add(row['nickname'])
+                result.update(status='error', error="Nickname already exists")
+            elif row['nickname'] in unreserved:
+                result.update(status='error', error="Nickname already exists")
+            elif row['email'].lower() in registered:
+                result.update(status='error', error="Email already exists")
+            else:
+                remaining.append((result, row))
+        candidates = remaining
+
+    # Auth accounts: hash locally, then import up to 1000 per call
+    passwords = [row['password'] for _, row in candidates]
+    hashed_chunks = await asyncio.gather(*(
+        run_in_threadpool(hash_passwords, chunk, BULK_IMPORT_PBKDF2_ROUNDS)
+        for chunk in chunks(passwords, HASH_CHUNK_SIZE)
+    ))
+    hashes = [hashed for chunk in hashed_chunks for hashed in chunk]
+    students = []
+    for (result, row), (password_hash, salt) in zip(candidates, hashes):
+        uid = uuid.uuid4().hex
+        students.append({
+            'result': result,
+            'uid': uid,
+            'sid': str(uuid.uuid4())[:8].upper(),
+            'email': row['email'],
+            'nickname': row['nickname'],
+            'record': auth.ImportUserRecord(uid, email=row['email'], password_hash=password_hash, password_salt=salt)
+        })
+    imported = []
+    hash_alg = auth.UserImportHash.pbkdf2_sha256(rounds=BULK_IMPORT_PBKDF2_ROUNDS)
+    for chunk in chunks(students, AUTH_BULK_LIMIT):
+        outcome = await run_in_threadpool(auth.import_users, [student['record'] for student in chunk], hash_alg=hash_alg)
+        failed = {error.index: error.reason for error in outcome.errors}
+        for i, student in enumerate(chunk):
+            if i in failed:
+                student['result'].update(status='error', error=failed[i])
+            else:
+                imported.append(student)
+
+    # Firestore: the batches are independent, so they commit concurrently
+    batches = chunks(imported, STUDENTS_PER_BATCH)
+    outcomes = await asyncio.gather(*(commit_enrollments(db, batch) for batch in batches))
+    failures = {uid: error for outcome in outcomes for uid, error in outcome.items()}
+    if failures:
+        # Do not leave Auth accounts without a student behind them
+        await delete_auth_users(list(failures))
+
+    for student in imported:
+        if student['uid'] in failures:
+            student['result'].update(status='error', error=failures[student['uid']])
+            continue
+        nickname_registry.add(student['nickname'])
+        login_cache.invalidate(email=student['email'])
+        student['result'].update(status='created', uid=student['uid'], sid=student['sid'])
+    return results
+
+@firestore.async_transactional
+async def _remove_chunk(transaction, db, uids: List[str]) -> Dict[str, Optional[str]]:
+    """Delete those of `uids` that exist, with their reservations and their share of the stats.
+    Reading them in the same transaction means a star awarded meanwhile is subtracted too.
+    Returns uid -> freed nickname, or None if the reservation was not theirs."""
+    refs = [db.collection('students').document(uid) for uid in uids]
+    students = {
+        snapshot.id: snapshot
+        async for snapshot in db.get_all(refs, field_paths=['nickname', 'progress'], transaction=transaction)
+        if snapshot.exists
+    }
+
+    # Reservations are only freed when they belong to the student being deleted
+    reservations = {uid: reservation_ref(db, student.to_dict()['nickname'])
+                    for uid, student in students.items() if student.to_dict().get('nickname')}
+    owners = {}
+    if reservations:
+        owners = {
+            snapshot.id: snapshot.to_dict().get('uid')
+            async for snapshot in db.get_all(list(reservations.values()), transaction=transaction)
+            if snapshot.exists
+        }
+
+    freed = {}
+    for uid, student in students.items():
+        transaction.delete(student.reference)
+        freed[uid] = None
+        if uid in reservations and owners.get(reservations[uid].id) == uid:
+            transaction.delete(reservations[uid])
+            freed[uid] = student.to_dict()['nickname']
+    if students:
+        progresses = [student.to_dict().get('progress', {}) for student in students.values()]
+        stats_rollup.record(db, stats_rollup.students_removed(progresses), transaction)
+    return freed
+
+async def remove_students(db, rows: List[dict]) -> List[dict]:
+    """Delete students, their nickname reservations and Auth accounts; one result per row"""
+    results = [{'row': i + 1, 'uid': row['uid']} for i, row in enumerate(rows)]
+    unique_uids = list(dict.fromkeys(row['uid'] for row in rows if row['uid'] and not row.get('error')))
+
+    batches = chunks(unique_uids, STUDENTS_PER_BATCH)
+    outcomes = await asyncio.gather(*(_remove_chunk(db.transaction(), db, chunk) for chunk in batches), return_exceptions=True)
+    failures = {
+        uid: str(outcome)
+        for chunk, outcome in zip(batches, outcomes) if isinstance(outcome, Exception)
+        for uid in chunk
+    }
+    # uid -> freed nickname, for every student deleted
+    removed = {}
+    for outcome in outcomes:
+        if not isinstance(outcome, Exception):
+            removed.update(outcome)
+    deleted = list(removed)
+
+    # As with single deletes, a failed Auth deletion does not undo the Firestore delete
+    auth_failures = await delete_auth_users(deleted) if deleted else {}
+
+    if deleted:
+        await manager.broadcast_students_removed(deleted, [nickname for nickname in removed.values() if nickname])
+    for uid in deleted:
+        login_cache.invalidate(uid=uid)
+
+    reported = set()
+    for result, row in zip(results, rows):
+        uid = result['uid']
+        if row.get('error'):
+            result.update(status='error', error=row['error'])
+        elif not uid:
+            result.update(status='error', error="uid is required")
+        elif uid in reported:
+            result.update(status='error', error="uid appears more than once in the roster")
+        elif uid in failures:
+            result.update(status='error', error=failures[uid])
+        elif uid not in removed:
+            result.update(status='error', error="Student not found")
+        else:
+            result['status'] = 'deleted'
+            if uid in auth_failures:
+                result['warning'] = f"Auth deletion failed: {auth_failures[uid]}"
+        reported.add(uid)
+    return results
@@ -1,23 +1,36 @@
-from fastapi import APIRouter, HTTPException
-from firebase_admin import auth
-from config import get_db
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from firebase_admin import firestore
+from config import get_async_db, get_auth
 from models.schemas import AdminSignup
+from websocket_manager import manager
+from level_cache import level_cache
+from login_cache import login_cache
+from nickname_registry import reservation_ref
+import stats_rollup
+from progress import StudentNotFound
+from roster import RosterError, parse_roster, enroll_students, remove_students
+import asyncio
+import json
 import uuid
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 
 admin_router = APIRouter()
-db = get_db()
+db = get_async_db()
+auth = get_auth()
 
 @admin_router.post("/signup")
 async def admin_signup(data: AdminSignup):
     try:
-        user = auth.create_user(email=data.email, password=data.password)
+        user = await run_in_threadpool(auth.create_user, email=data.email, password=data.password)
         aid = str(uuid.uuid4())[:8].upper()
-        db.collection('admins').document(user.uid).set({
+        await db.collection('admins').document(user.uid).set({
             'aid': aid,
             'email': data.email,
             'type': 'admin'
         })
+        login_cache.invalidate(email=data.email)
         return {"message": "Admin created successfully", "aid": aid}
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
@@ -30,7 +43,7 @@ async def get_all_levels():
         levels = levels_ref.stream()
         
         levels_data = {}
-        for level in levels:
+        async for level in levels:
             level_data = level.to_dict()
             levels_data[level.id] = {
                 "level_id": level_data.get("level_id"),
@@ -53,114 +66,212 @@ async def update_level(level_id: str, tasks: List[str], translations: List[str])
             raise HTTPException(status_code=400, detail="Tasks and translations must have the same length")
         
         level_ref = db.collection('levels').document(level_id)
-        level_doc = level_ref.get()
+        level_doc = await level_ref.get()
         
         if not level_doc.exists:
             # Create new level if it doesn't exist
-            level_ref.set({
+            batch = db.batch()
+            batch.set(level_ref, {
                 "level_id": int(level_id),
                 "tasks": tasks,
                 "translations": translations
             })
+            stats_rollup.record(db, stats_rollup.level_added(), batch)
+            await batch.commit()
         else:
             # Update existing level
-            level_ref.update({
+            await level_ref.update({
                 "tasks": tasks,
                 "translations": translations
             })
         
+        level_cache.invalidate()
         return {"message": f"Level {level_id} updated successfully"}
     except ValueError:
         raise HTTPException(status_code=400, detail="Invalid level ID format")
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+# Sortable columns of the student listing and the Firestore field behind each
+STUDENT_SORT_FIELDS = {
+    'total_stars': 'progress.total_stars',
+    'current_level': 'progress.current_level',
+    'nickname': 'nickname',
+    'email': 'email',
+    'sid': 'sid'
+}
+
+async def student_listing_query(sort: str, order: str):
+    # Only the listed fields are fetched; of each level only completed_at is needed.
+    # Level keys are digits, so they must be quoted in select() paths.
+    level_ids = (await level_cache.all()).keys()
+    fields = ['sid', 'email', 'nickname', 'progress.current_level', 'progress.total_stars']
+    fields += [f'progress.levels.`{level_id}`.completed_at' for level_id in level_ids]
+    direction = firestore.Query.DESCENDING if order == 'desc' else firestore.Query.ASCENDING
+    return db.collection('students').order_by(STUDENT_SORT_FIELDS[sort], direction=direction).select(fields)
+
+def to_student_row(student) -> dict:
+    student_data = student.to_dict()
+    progress = student_data.get('progress', {})
+    return {
+        'uid': student.id,
+        'sid': student_data.get('sid') or 'N/A',
+        'email': student_data.get('email') or 'N/A',
+        'nickname': student_data.get('nickname') or 'Unknown',
+        'current_level': progress.get('current_level', 1),
+        'total_stars': progress.get('total_stars', 0),
+        'levels_completed': len([l for l in progress.get('levels', {}).values() if l.get('completed_at')])
+    }
+
+async def ndjson_rows(query):
+    async for student in query.stream():
+        yield json.dumps(to_student_row(student)) + "\n"
+
 @admin_router.get("/students")
-async def get_all_students():
-    """Get all students with their progress"""
+async def get_all_students(
+    page_size: Optional[int] = None,
+    start_after: Optional[str] = None,
+    sort: str = 'total_stars',
+    order: str = 'desc',
+    format: str = 'json'
+):
+    """Get students with their progress, sorted by Firestore.
+
+    Page with page_size and the previous page's next_cursor as start_after;
+    format=ndjson streams one student per line for exports.
+    """
     try:
-        students_ref = db.collection('students')
-        students = students_ref.stream()
-        
-        students_data = []
-        for student in students:
-            student_data = student.to_dict()
-            progress = student_data.get('progress', {})
-            students_data.append({
-                'uid': student.id,
-                'sid': student_data.get('sid', 'N/A'),
-                'email': student_data.get('email', 'N/A'),
-                'nickname': student_data.get('nickname', 'Unknown'),
-                'current_level': progress.get('current_level', 1),
-                'total_stars': progress.get('total_stars', 0),
-                'levels_completed': len([l for l in progress.get('levels', {}).values() if l.get('completed_at')])
-            })
-        
-        # Sort by total_stars in descending order
-        students_data.sort(key=lambda x: x['total_stars'], reverse=True)
-        
-        return {
+        if sort not in STUDENT_SORT_FIELDS:
+            raise HTTPException(status_code=400, detail=f"sort must be one of: {', '.join(STUDENT_SORT_FIELDS)}")
+        if order not in ('asc', 'desc') or format not in ('json', 'ndjson'):
+            raise HTTPException(status_code=400, detail="order must be asc or desc, format json or ndjson")
+        if page_size is not None and page_size < 1:
+            raise HTTPException(status_code=400, detail="page_size must be positive")
+
+        query = await student_listing_query(sort, order)
+        if start_after is not None:
+            # The cursor snapshot only needs the sort field; ties continue by document id
+            cursor = await db.collection('students').document(start_after).get(field_paths=[STUDENT_SORT_FIELDS[sort]])
+            if not cursor.exists:
+                raise HTTPException(status_code=400, detail="start_after is not a student")
+            query = query.start_after(cursor)
+        if page_size is not None:
+            query = query.limit(page_size)
+
+        if format == 'ndjson':
+            return StreamingResponse(ndjson_rows(query), media_type="application/x-ndjson")
+
+        # Counted with the same ordering, which leaves out students missing the sort field
+        # (scripts/backfill_nicknames.py fills it in), so the total matches what paging reaches
+        students, total_students = await asyncio.gather(
+            query.get(),
+            db.collection('students').order_by(STUDENT_SORT_FIELDS[sort]).count().get()
+        )
+        students_data = [to_student_row(student) for student in students]
+        response = {
             "students": students_data,
-            "total_students": len(students_data)
+            "total_students": total_students[0][0].value
         }
+        if page_size is not None:
+            response["next_cursor"] = students_data[-1]['uid'] if len(students_data) == page_size else None
+        return response
+    except HTTPException as e:
+        raise e
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+async def read_roster(request: Request, fields: tuple) -> list:
+    """Roster rows from a CSV or JSON body, or from a file uploaded as the "roster" form field"""
+    content_type = request.headers.get('content-type', '')
+    if content_type.startswith('multipart/form-data'):
+        form = await request.form()
+        upload = form.get('roster')
+        if upload is None or isinstance(upload, str):
+            raise RosterError("Upload the roster file as the 'roster' form field")
+        body = await upload.read()
+        content_type = 'application/json' if (upload.filename or '').lower().endswith('.json') else 'text/csv'
+    else:
+        body = await request.body()
+    return parse_roster(body, content_type, fields)
+
+@admin_router.post("/students/bulk")
+async def bulk_enroll_students(request: Request):
+    """Enroll a class from a CSV (email,password,nickname) or JSON roster; one result per row"""
+    try:
+        rows = await read_roster(request, ('email', 'password', 'nickname'))
+        results = await enroll_students(db, rows)
+        created = sum(1 for result in results if result['status'] == 'created')
+        return {"created": created, "failed": len(results) - created, "results": results}
+    except RosterError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@admin_router.post("/students/bulk-delete")
+async def bulk_delete_students(request: Request):
+    """Delete students listed by uid in a CSV (uid column) or JSON roster; one result per row"""
+    try:
+        rows = await read_roster(request, ('uid',))
+        results = await remove_students(db, rows)
+        deleted = sum(1 for result in results if result['status'] == 'deleted')
+        return {"deleted": deleted, "failed": len(results) - deleted, "results": results}
+    except RosterError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@firestore.async_transactional
+async def _delete_student(transaction, db, student_uid: str) -> Optional[str]:
+    """Delete the student, their reservation and their share of the stats in one transaction,
+    so a star awarded meanwhile is subtracted too; returns the freed nickname, if any"""
+    student_ref = db.collection('students').document(student_uid)
+    student_doc = await student_ref.get(field_paths=['nickname', 'progress'], transaction=transaction)
+    if not student_doc.exists:
+        raise StudentNotFound("Student not found")
+    student_data = student_doc.to_dict()
+
+    # Free the nickname, unless the reservation belongs to someone else
+    nickname = student_data.get('nickname')
+    freed_nickname = None
+    if nickname:
+        reservation = await reservation_ref(db, nickname).get(transaction=transaction)
+        if reservation.exists and reservation.to_dict().get('uid') == student_uid:
+            transaction.delete(reservation.reference)
+            freed_nickname = nickname
+    transaction.delete(student_ref)
+    stats_rollup.record(db, stats_rollup.student_removed(student_data.get('progress', {})), transaction)
+    return freed_nickname
+
 @admin_router.delete("/students/{student_uid}")
 async def delete_student(student_uid: str):
     """Delete a student account"""
     try:
         # Delete from Firestore
-        student_ref = db.collection('students').document(student_uid)
-        student_doc = student_ref.get()
-        
-        if not student_doc.exists:
-            raise HTTPException(status_code=404, detail="Student not found")
-        
-        student_ref.delete()
+        try:
+            freed_nickname = await _delete_student(db.transaction(), db, student_uid)
+        except StudentNotFound as e:
+            raise HTTPException(status_code=404, detail=str(e))
+        # Also frees the nickname in every worker's registry
+        await manager.broadcast_students_removed([student_uid], [freed_nickname] if freed_nickname else [])
+        login_cache.invalidate(uid=student_uid)
         
         # Delete from Firebase Auth
         try:
-            auth.delete_user(student_uid)
+            await run_in_threadpool(auth.delete_user, student_uid)
         except Exception as auth_error:
             # Continue even if auth deletion fails
             print(f"Auth deletion warning: {auth_error}")
         
         return {"message": "Student deleted successfully"}
+    except HTTPException as e:
+        raise e
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @admin_router.get("/stats")
 async def get_admin_stats():
-    """Get general statistics for admin dashboard"""
+    """Get general statistics for admin dashboard from the sharded stats rollup"""
     try:
-        # Get student count
-        students_ref = db.collection('students')
-        students = list(students_ref.stream())
-        total_students = len(students)
-        
-        # Get level count
-        levels_ref = db.collection('levels')
-        levels = list(levels_ref.stream())
-        total_levels = len(levels)
-        
-        # Calculate total stars earned by all students
-        total_stars_awarded = 0
-        active_students = 0
-        
-        for student in students:
-            student_data = student.to_dict()
-            progress = student_data.get('progress', {})
-            student_stars = progress.get('total_stars', 0)
-            total_stars_awarded += student_stars
-            if student_stars > 0:
-                active_students += 1
-        
-        return {
-            "total_students": total_students,
-            "active_students": active_students,
-            "total_levels": total_levels,
-            "total_stars_awarded": total_stars_awarded
-        }
+        return await stats_rollup.read(db)
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
@@ -1,35 +1,50 @@
 from fastapi import APIRouter, HTTPException
-from firebase_admin import auth
-from config import get_db
+from fastapi.concurrency import run_in_threadpool
+from config import get_async_db, get_auth
 from models.schemas import LoginRequest
+from login_cache import login_cache
+import asyncio
 
 auth_router = APIRouter()
-db = get_db()
+db = get_async_db()
+auth = get_auth()
+
+async def lookup_profile(email: str) -> dict:
+    user = await run_in_threadpool(auth.get_user_by_email, email)
+
+    # A uid is either a student or an admin; check both at once
+    student_doc, admin_doc = await asyncio.gather(
+        db.collection('students').document(user.uid).get(field_paths=['sid', 'nickname']),
+        db.collection('admins').document(user.uid).get(field_paths=['aid'])
+    )
+    if student_doc.exists:
+        student_data = student_doc.to_dict()
+        return {
+            "type": "student",
+            "uid": user.uid,
+            "sid": student_data['sid'],
+            "nickname": student_data['nickname']
+        }
+
+    if admin_doc.exists:
+        admin_data = admin_doc.to_dict()
+        return {
+            "type": "admin",
+            "uid": user.uid,
+            "aid": admin_data['aid']
+        }
+
+    raise HTTPException(status_code=404, detail="User not found")
 
 @auth_router.post("/login")
 async def login(data: LoginRequest):
     try:
-        user = auth.get_user_by_email(data.email)
-        
-        student_doc = db.collection('students').document(user.uid).get()
-        if student_doc.exists:
-            student_data = student_doc.to_dict()
-            return {
-                "type": "student",
-                "uid": user.uid,
-                "sid": student_data['sid'],
-                "nickname": student_data['nickname']
-            }
-        
-        admin_doc = db.collection('admins').document(user.uid).get()
-        if admin_doc.exists:
-            admin_data = admin_doc.to_dict()
-            return {
-                "type": "admin",
-                "uid": user.uid,
-                "aid": admin_data['aid']
-            }
-        
-        raise HTTPException(status_code=404, detail="User not found")
+        profile = login_cache.get(data.email)
+        if profile is None:
+            profile = await lookup_profile(data.email)
+            login_cache.put(data.email, profile)
+        return profile
+    except HTTPException as e:
+        raise e
     except Exception as e:
-        raise HTTPException(status_code=400, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=400, detail=str(e))
@@ -1,40 +1,132 @@
 from fastapi import APIRouter, HTTPException
-from config import get_db
+import asyncio
+from firebase_admin import firestore
+from typing import List, Optional, Tuple
+from config import get_async_db
 from websocket_manager import manager
+from leaderboard_index import leaderboard_index
 
 leaderboard_router = APIRouter()
-db = get_db()
+db = get_async_db()
+
+# Students with stars, best first. Ties are broken by uid so cursors are stable and the
+# order matches the in-memory index; this needs the composite index in firestore.indexes.json.
+# Only the two fields the leaderboard shows are downloaded, not whole progress maps.
+def ranked_students_query():
+    return (
+        db.collection('students')
+        .where('progress.total_stars', '>', 0)
+        .order_by('progress.total_stars', direction=firestore.Query.DESCENDING)
+        .order_by('__name__')
+        .select(['nickname', 'progress.total_stars'])
+    )
+
+def to_entry(student) -> dict:
+    student_data = student.to_dict()
+    return {
+        'uid': student.id,
+        'nickname': student_data.get('nickname', 'Unknown'),
+        'total_stars': student_data.get('progress', {}).get('total_stars', 0)
+    }
+
+async def read_leaderboard_rows() -> List[Tuple[str, str, int]]:
+    """(uid, nickname, total_stars) for every student with stars, already in leaderboard order"""
+    rows = []
+    async for student in ranked_students_query().stream():
+        entry = to_entry(student)
+        rows.append((entry['uid'], entry['nickname'], entry['total_stars']))
+    return rows
+
+# Aggregation query: billed per 1000 index entries, no documents are downloaded
+async def count_students_above(total_stars: int = 0) -> int:
+    query = db.collection('students').where('progress.total_stars', '>', total_stars)
+    return (await query.count().get())[0][0].value
+
+async def read_student_entry(uid: str) -> Optional[dict]:
+    student = await db.collection('students').document(uid).get(field_paths=['nickname', 'progress.total_stars'])
+    if not student.exists:
+        return None
+    entry = to_entry(student)
+    return entry if entry['total_stars'] > 0 else None
+
+async def query_leaderboard_page(offset: int, limit: Optional[int], start_after: Optional[str] = None) -> Optional[List[dict]]:
+    """One page straight from Firestore; None if the start_after student is not on the board"""
+    query = ranked_students_query()
+    if start_after is not None:
+        cursor = await db.collection('students').document(start_after).get()
+        if not cursor.exists or cursor.to_dict().get('progress', {}).get('total_stars', 0) <= 0:
+            return None
+        query = query.start_after(cursor)
+    elif offset:
+        # Skipped documents are still billed; clients paging deep should use start_after
+        query = query.offset(offset)
+    if limit is not None:
+        query = query.limit(limit)
+    return [to_entry(student) async for student in query.stream()]
+
+async def load_leaderboard_index():
+    """Seed the in-memory leaderboard at startup and after reconnecting to the broker"""
+    leaderboard_index.begin_seed()
+    rows = await read_leaderboard_rows()
+    leaderboard_index.seed(rows)
+
+# Until startup seeding finishes, each read below is answered with a bounded Firestore query
+
+async def fetch_page(offset: int, limit: Optional[int], start_after: Optional[str]) -> Optional[List[dict]]:
+    if leaderboard_index.ready:
+        if start_after is not None:
+            return leaderboard_index.page_after(start_after, limit)
+        return leaderboard_index.page(offset, limit)
+    return await query_leaderboard_page(offset, limit, start_after)
+
+async def fetch_top(k: int) -> List[dict]:
+    if leaderboard_index.ready:
+        return leaderboard_index.top(k)
+    return await query_leaderboard_page(0, k)
+
+async def fetch_total_players() -> int:
+    if leaderboard_index.ready:
+        return len(leaderboard_index)
+    return await count_students_above()
 
 @leaderboard_router.get("/leaderboard")
-async def get_leaderboard():
-    """Get all students ranked by total stars"""
+async def get_leaderboard(page: int = 1, page_size: Optional[int] = None, start_after: Optional[str] = None):
+    """Get students ranked by total stars, optionally one page at a time.
+
+    Pass the previous page's next_cursor as start_after to continue from it.
+    """
     try:
-        students_ref = db.collection('students')
-        students = students_ref.stream()
-        leaderboard_data = []
-        
-        for student in students:
-            student_data = student.to_dict()
-            progress = student_data.get('progress', {})
-            total_stars = progress.get('total_stars', 0)
-            # Only include students with progress
-            if total_stars > 0:
-                leaderboard_data.append({
-                    'uid': student.id,
-                    'nickname': student_data.get('nickname', 'Unknown'),
-                    'total_stars': total_stars
-                })
-        # Sort by total_stars in descending order
-        leaderboard_data.sort(key=lambda x: x['total_stars'], reverse=True)
+        if page < 1 or (page_size is not None and page_size < 1):
+            raise HTTPException(status_code=400, detail="page and page_size must be positive")
+
+        offset = (page - 1) * page_size if page_size else 0
+        first_page = offset == 0 and start_after is None and (page_size is None or page_size >= 5)
+        # The page, the count and (unless the page already holds it) the top 5 are independent reads
+        reads = [fetch_page(offset, page_size, start_after), fetch_total_players()]
+        if not first_page:
+            reads.append(fetch_top(5))
+        leaderboard_data, total_players, *top5 = await asyncio.gather(*reads)
+        if leaderboard_data is None:
+            raise HTTPException(status_code=400, detail="start_after is not a student on the leaderboard")
+
         # Broadcast top 5 to WebSocket clients
-        top5 = leaderboard_data[:5]
-        await manager.broadcast_leaderboard_update(top5)
-        
-        return {
+        await manager.broadcast_leaderboard_update(top5[0] if top5 else leaderboard_data[:5])
+
+        response = {
             "leaderboard": leaderboard_data,
-            "total_players": len(leaderboard_data)
+            "total_players": total_players
         }
-        
+        if page_size:
+            response.update({
+                "page_size": page_size,
+                "next_cursor": leaderboard_data[-1]['uid'] if len(leaderboard_data) == page_size else None
+            })
+            if start_after is None:
+                response["page"] = page
+        return response
+
+    except HTTPException as e:
+        raise e
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -42,9 +134,31 @@ async def get_leaderboard():
 async def get_top5_leaderboard():
     """Get top 5 students for quick access"""
     try:
-        full_leaderboard = await get_leaderboard()
         return {
-            "top5": full_leaderboard["leaderboard"][:5]
+            "top5": await fetch_top(5)
+        }
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@leaderboard_router.get("/leaderboard/rank/{student_uid}")
+async def get_student_rank(student_uid: str):
+    """Get a student's leaderboard position; equal stars share a rank"""
+    try:
+        if leaderboard_index.ready:
+            entry = leaderboard_index.get(student_uid)
+            rank = leaderboard_index.rank(student_uid) if entry else None
+            total_players = len(leaderboard_index)
+        else:
+            entry, total_players = await asyncio.gather(read_student_entry(student_uid), count_students_above())
+            rank = await count_students_above(entry['total_stars']) + 1 if entry else None
+        if entry is None:
+            raise HTTPException(status_code=404, detail="Student has no stars on the leaderboard yet")
+        return {
+            **entry,
+            "rank": rank,
+            "total_players": total_players
         }
+    except HTTPException as e:
+        raise e
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
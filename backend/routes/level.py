@@ -1,9 +1,18 @@
 from fastapi import APIRouter, HTTPException
-from config import get_db
+from level_cache import level_cache
 
-db = get_db()
 levels_router = APIRouter()
 
+# Declared before /{level_id} so "version" is not parsed as a level id
+@levels_router.get("/version")
+async def get_levels_version():
+    """Content version of all levels; it changes whenever any level is edited"""
+    try:
+        return {"version": await level_cache.current_version()}
+    except Exception as e:
+        print(f"Error fetching levels version: {e}")
+        raise HTTPException(status_code=500, detail="Internal server error")
+
 @levels_router.get("/{level_id}/tasks")
 async def get_level_tasks(level_id: int):
     """Get tasks for a specific level"""
@@ -11,13 +20,11 @@ async def get_level_tasks(level_id: int):
         if level_id < 1 or level_id > 7: 
             raise HTTPException(status_code=400, detail="Invalid level ID")
             
-        doc_ref = db.collection('levels').document(str(level_id))
-        doc = doc_ref.get()
+        level_data = await level_cache.get(level_id)
         
-        if not doc.exists:
+        if level_data is None:
             raise HTTPException(status_code=404, detail="Level not found")
-            
-        level_data = doc.to_dict()
+
         return {
             "level": level_id, 
             "tasks": level_data.get("tasks", [])
@@ -36,13 +43,11 @@ async def get_level_translations(level_id: int):
         if level_id < 1 or level_id > 7:
             raise HTTPException(status_code=400, detail="Invalid level ID")
             
-        doc_ref = db.collection('levels').document(str(level_id))
-        doc = doc_ref.get()
+        level_data = await level_cache.get(level_id)
         
-        if not doc.exists:
+        if level_data is None:
             raise HTTPException(status_code=404, detail="Level not found")
-            
-        level_data = doc.to_dict()
+
         return {
             "level": level_id,
             "translations": level_data.get("translations", [])
@@ -60,13 +65,11 @@ async def get_level_data(level_id: int):
         if level_id < 1 or level_id > 7:
             raise HTTPException(status_code=400, detail="Invalid level ID")
             
-        doc_ref = db.collection('levels').document(str(level_id))
-        doc = doc_ref.get()
+        level_data = await level_cache.get(level_id)
         
-        if not doc.exists:
+        if level_data is None:
             raise HTTPException(status_code=404, detail="Level not found")
-            
-        level_data = doc.to_dict()
+
         # Return the complete level data
         return {
             "level_id": level_id,
@@ -1,44 +1,76 @@
 from fastapi import APIRouter, HTTPException
-from firebase_admin import auth
-from config import get_db
+from fastapi.concurrency import run_in_threadpool
+from google.api_core.exceptions import AlreadyExists
+from config import get_async_db, get_auth
 from models.schemas import StudentSignup, TaskResponse
+from websocket_manager import manager
+from level_cache import level_cache
+from login_cache import login_cache
+from nickname_registry import NICKNAMES_COLLECTION, backfill_ref, nickname_registry, normalize_nickname, reservation_ref
+import stats_rollup
+from progress import award_task, new_level_progress, StudentNotFound, LevelNotUnlocked
 import uuid
-from datetime import datetime
 
 student_router = APIRouter()
-db = get_db()
+db = get_async_db()
+auth = get_auth()
+
+async def load_nickname_registry():
+    """Seed the in-memory nickname pre-check at startup and after reconnecting to the broker"""
+    ids = [doc.id async for doc in db.collection(NICKNAMES_COLLECTION).select([]).stream()]
+    nickname_registry.seed(ids)
+    nickname_registry.backfilled = (await backfill_ref(db).get()).exists
 
 @student_router.post("/signup")
 async def student_signup(data: StudentSignup):
     try:
-        students = db.collection('students').where('nickname', '==', data.nickname).get()
-        if students:
+        if not normalize_nickname(data.nickname):
+            raise HTTPException(status_code=400, detail="Nickname is required")
+        # Known duplicates are rejected without touching Firestore
+        if nickname_registry.is_taken(data.nickname):
+            raise HTTPException(status_code=400, detail="Nickname already exists")
+        if await nickname_registry.taken_without_reservation(db, [data.nickname]):
             raise HTTPException(status_code=400, detail="Nickname already exists")
-        user = auth.create_user(email=data.email, password=data.password)
+        # Firebase Auth has no async API; keep its HTTP call off the event loop
+        user = await run_in_threadpool(auth.create_user, email=data.email, password=data.password)
         sid = str(uuid.uuid4())[:8].upper()
         # Initialize with first level unlocked
         initial_progress = {
             'current_level': 1,
             'total_stars': 0,
             'levels': {
-                '1': {
-                    'level_id': 1,
-                    'stars_earned': 0,
-                    'tasks_completed': [],
-                    'is_unlocked': True,
-                    'completed_at': None
-                }
+                '1': new_level_progress(1)
             }
         }
         
-        db.collection('students').document(user.uid).set({
+        # The reservation is created only if nobody holds it, atomically with the student
+        batch = db.batch()
+        batch.create(reservation_ref(db, data.nickname), {
+            'uid': user.uid,
+            'nickname': data.nickname
+        })
+        batch.set(db.collection('students').document(user.uid), {
             'sid': sid,
             'email': data.email,
             'nickname': data.nickname,
             'type': 'student',
             'progress': initial_progress
         })
+        stats_rollup.record(db, stats_rollup.student_added(), batch)
+        try:
+            await batch.commit()
+        except Exception as e:
+            # Nothing was written; do not leave an Auth account without a student behind it
+            await run_in_threadpool(auth.delete_user, user.uid)
+            if isinstance(e, AlreadyExists):
+                nickname_registry.add(data.nickname)
+                raise HTTPException(status_code=400, detail="Nickname already exists")
+            raise
+        nickname_registry.add(data.nickname)
+        login_cache.invalidate(email=data.email)
         return {"message": "Student created successfully", "sid": sid}
+    except HTTPException as e:
+        raise e
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
@@ -47,61 +79,37 @@ async def complete_task(student_uid: str, level_id: int, task_id: int):
     """Complete a task and award stars"""
     try:
         # Fetch level data to validate task_id
-        level_doc = db.collection('levels').document(str(level_id)).get()
-        if not level_doc.exists():
+        level_data = await level_cache.get(level_id)
+        if level_data is None:
             raise HTTPException(status_code=404, detail="Level not found")
-        tasks = level_doc.to_dict().get("tasks", [])
+        tasks = level_data.get("tasks", [])
         if task_id >= len(tasks):
             raise HTTPException(status_code=400, detail="Invalid task ID")
         task_word = tasks[task_id]
 
-        # Fetch student document
-        student_ref = db.collection('students').document(student_uid)
-        student_doc = student_ref.get()
-        if not student_doc.exists():
-            raise HTTPException(status_code=404, detail="Student not found")
-
-        student_data = student_doc.to_dict()
-        progress = student_data.get('progress', {})
-        levels = progress.get('levels', {})
-        level_key = str(level_id)
-
-        if level_key not in levels:
-            raise HTTPException(status_code=400, detail="Level not unlocked")
-
-        level_progress = levels[level_key]
-
-        # Add task if not already completed
-        if task_id not in level_progress['tasks_completed']:
-            level_progress['tasks_completed'].append(task_id)
-            level_progress['stars_earned'] = len(level_progress['tasks_completed'])
-
-            # Unlock next level if current one is completed
-            if level_progress['stars_earned'] >= 2:
-                level_progress['completed_at'] = datetime.utcnow().isoformat()
-                next_level = level_id + 1
-                next_key = str(next_level)
-                if next_key not in levels:
-                    levels[next_key] = {
-                        'level_id': next_level,
-                        'stars_earned': 0,
-                        'tasks_completed': [],
-                        'is_unlocked': True,
-                        'completed_at': None
-                    }
-                    progress['current_level'] = next_level
-
-        progress['total_stars'] = sum(level['stars_earned'] for level in levels.values())
-        student_ref.update({'progress': progress})
+        try:
+            result = await award_task(db, student_uid, level_id, task_id)
+        except StudentNotFound as e:
+            raise HTTPException(status_code=404, detail=str(e))
+        except LevelNotUnlocked as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        if result['updated']:
+            await manager.broadcast_score_update({
+                "user_id": student_uid,
+                "nickname": result['nickname'],
+                "total_stars": result['total_stars']
+            })
 
         return {
             "message": "Task completed successfully",
             "task_word": task_word,
-            "stars_earned": level_progress['stars_earned'],
-            "level_completed": level_progress['stars_earned'] >= 2,
-            "next_level_unlocked": level_progress['stars_earned'] >= 2
+            "stars_earned": result['stars_earned'],
+            "level_completed": result['level_completed'],
+            "next_level_unlocked": result['level_completed']
         }
 
+    except HTTPException as e:
+        raise e
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
@@ -109,7 +117,7 @@ async def complete_task(student_uid: str, level_id: int, task_id: int):
 async def get_student_progress(student_uid: str):
     """Get student's current progress"""
     try:
-        student_doc = db.collection('students').document(student_uid).get()
+        student_doc = await db.collection('students').document(student_uid).get()
         
         if not student_doc.exists:
             raise HTTPException(status_code=404, detail="Student not found")
@@ -127,7 +135,7 @@ async def get_student_progress(student_uid: str):
 async def get_available_levels(student_uid: str):
     """Get all unlocked levels for student"""
     try:
-        student_doc = db.collection('students').document(student_uid).get()
+        student_doc = await db.collection('students').document(student_uid).get(field_paths=['progress'])
         
         if not student_doc.exists:
             raise HTTPException(status_code=404, detail="Student not found")
@@ -1,14 +1,41 @@
 from fastapi import APIRouter, UploadFile, File, HTTPException, Form
-from typing import List
+from fastapi.concurrency import run_in_threadpool
+from typing import List, Optional, Tuple
 from PIL import Image
 import io
-from datetime import datetime
-from config import get_db
-from scripts.inference import predict_word_from_images
+import numpy as np
+from config import get_async_db
+from scripts.inference import preprocess_into, decode_predictions, buffer_pool
+from inference_scheduler import scheduler, SchedulerOverloaded
+from prediction_cache import prediction_cache
 from websocket_manager import manager
+from level_cache import level_cache
+from progress import award_task, StudentNotFound, LevelNotUnlocked
 
 predict_router = APIRouter()
-db = get_db()
+db = get_async_db()
+
+def lookup_cached(batch: np.ndarray) -> Tuple[list, list, Optional[np.ndarray]]:
+    """Cache keys, cached probabilities (None where missing) and a copy of the uncached characters.
+
+    Nothing returned refers to `batch`, so a pooled buffer can be released right after.
+    """
+    keys = [prediction_cache.key(character) for character in batch]
+    probs = [prediction_cache.get(key) for key in keys]
+    missing = [i for i, p in enumerate(probs) if p is None]
+    # Fancy indexing copies
+    return keys, probs, batch[missing] if missing else None
+
+async def predict_uncached(keys: list, probs: list, uncached: Optional[np.ndarray]) -> np.ndarray:
+    """Averaged probabilities per character; repeat drawings were served from the cache"""
+    if uncached is not None:
+        missing = [i for i, p in enumerate(probs) if p is None]
+        fresh = await scheduler.predict(uncached)
+        for i, p in zip(missing, fresh):
+            prediction_cache.put(keys[i], p)
+            probs[i] = p
+
+    return np.stack(probs)
 
 @predict_router.post("/student/{student_uid}/predict-task")
 async def predict_task(
@@ -21,12 +48,12 @@ async def predict_task(
         if not (3 <= len(images) <= 9):
             raise HTTPException(status_code=400, detail="Provide 3 to 9 images")
 
-        # Fetch level and task
-        level_doc = db.collection("levels").document(str(level_id)).get()
-        if not level_doc.exists:
+        # Fetch level and task from the level cache
+        level_data = await level_cache.get(level_id)
+        if level_data is None:
             raise HTTPException(status_code=404, detail="Level not found")
 
-        tasks = level_doc.to_dict().get("tasks", [])
+        tasks = level_data.get("tasks", [])
         if task_id >= len(tasks):
             raise HTTPException(status_code=400, detail="Invalid task ID")
 
@@ -49,8 +76,18 @@ async def predict_task(
             except Exception as e:
                 raise HTTPException(status_code=400, detail=f"Error reading image {i+1}: {str(e)}")
 
-        # Predict word
-        predicted_word = predict_word_from_images(pil_images)
+        # The pooled buffer goes back as soon as the cache keys and the uncached characters
+        # are copied out, so it is not held through the queue and model wait
+        with buffer_pool.batch(len(pil_images)) as buffer:
+            batch = await run_in_threadpool(preprocess_into, pil_images, buffer)
+            lookup = lookup_cached(batch)
+
+        # Predict word; characters are batched with other in-flight requests
+        try:
+            probs = await predict_uncached(*lookup)
+        except SchedulerOverloaded as e:
+            raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+        predicted_word = ''.join(decode_predictions(probs))
         correct = predicted_word.upper() == target_word.upper()
 
         # Default flags
@@ -60,54 +97,24 @@ async def predict_task(
         next_level_unlocked = False
 
         if correct:
-            student_ref = db.collection('students').document(student_uid)
-            student_doc = student_ref.get()
-
-            if not student_doc.exists:
-                raise HTTPException(status_code=404, detail="Student not found")
-
-            student_data = student_doc.to_dict()
-            progress = student_data.get('progress', {})
-            levels = progress.get('levels', {})
-            level_key = str(level_id)
-
-            if level_key not in levels:
-                raise HTTPException(status_code=400, detail="Level not unlocked")
-
-            level_progress = levels[level_key]
-
-            # Only update if task is not already completed
-            if task_id not in level_progress['tasks_completed']:
-                level_progress['tasks_completed'].append(task_id)
-                level_progress['stars_earned'] = len(level_progress['tasks_completed'])
-                stars_earned = level_progress['stars_earned']
+            try:
+                result = await award_task(db, student_uid, level_id, task_id)
+            except StudentNotFound as e:
+                raise HTTPException(status_code=404, detail=str(e))
+            except LevelNotUnlocked as e:
+                raise HTTPException(status_code=400, detail=str(e))
+
+            # Only broadcast when a new star was awarded
+            if result['updated']:
                 updated = True
-
-                # Check for level completion and unlock next
-                if stars_earned >= 2:
-                    level_progress['completed_at'] = datetime.utcnow().isoformat()
-                    level_completed = True
-                    next_level = level_id + 1
-                    next_key = str(next_level)
-                    if next_key not in levels:
-                        levels[next_key] = {
-                            'level_id': next_level,
-                            'stars_earned': 0,
-                            'tasks_completed': [],
-                            'is_unlocked': True,
-                            'completed_at': None
-                        }
-                        progress['current_level'] = next_level
-                        next_level_unlocked = True
-
-                # Update total stars
-                progress['total_stars'] = sum(lvl.get('stars_earned', 0) for lvl in levels.values())
-
-                # Save back and broadcast progress
-                student_ref.update({'progress': progress})
+                stars_earned = result['stars_earned']
+                level_completed = result['level_completed']
+                next_level_unlocked = result['next_level_unlocked']
+                # Also updates the leaderboard index, here and on every other worker
                 await manager.broadcast_score_update({
                     "user_id": student_uid,
-                    "total_stars": progress.get("total_stars", 0)
+                    "nickname": result['nickname'],
+                    "total_stars": result['total_stars']
                     })
 
         # Final response
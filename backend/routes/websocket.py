@@ -13,8 +13,10 @@ async def websocket_score_updates(websocket: WebSocket):
             # Keep connection alive
             await websocket.receive_text()
     except WebSocketDisconnect:
-        manager.disconnect_score_updates(websocket)
         logger.info("Score updates WebSocket disconnected")
+    finally:
+        # Also reached when the manager closed a slow client
+        manager.disconnect_score_updates(websocket)
 
 @websocket_router.websocket("/ws/leaderboard")
 async def websocket_leaderboard(websocket: WebSocket):
@@ -24,5 +26,6 @@ async def websocket_leaderboard(websocket: WebSocket):
             # Keep connection alive
             await websocket.receive_text()
     except WebSocketDisconnect:
-        manager.disconnect_leaderboard(websocket)
-        logger.info("Leaderboard WebSocket disconnected")
\ No newline at end of file
+        logger.info("Leaderboard WebSocket disconnected")
+    finally:
+        manager.disconnect_leaderboard(websocket)
\ No newline at end of file
@@ -0,0 +1,107 @@
+# Bring students created by older versions up to date: create their nickname reservations
+# and fill in the fields the admin listing sorts on. Run once from the backend directory
+# after deploying:
+#   python -m scripts.backfill_nicknames --dry-run
+#   python -m scripts.backfill_nicknames
+# Students whose nickname is already reserved by someone else are listed, not changed.
+# Until it has run, signups also check the students collection for older nicknames.
+
+import argparse
+import uuid
+from datetime import datetime
+
+from config import get_auth, get_db
+from nickname_registry import NICKNAMES_COLLECTION, backfill_ref, reservation_id
+
+# Firestore allows at most 500 writes per batch
+BATCH_SIZE = 500
+# Firebase Auth looks up at most 100 users per call
+AUTH_LOOKUP_LIMIT = 100
+
+# Firestore leaves documents missing an order_by field out of the results, so a student
+# without one of STUDENT_SORT_FIELDS (routes/admin.py) could never be listed
+def sort_field_defaults(student: dict) -> dict:
+    """Field paths to set on a student lacking any listing sort field; email is filled from Auth later"""
+    progress = student.get('progress') or {}
+    levels = progress.get('levels') or {}
+    defaults = {}
+    if 'total_stars' not in progress:
+        defaults['progress.total_stars'] = sum(level.get('stars_earned', 0) for level in levels.values())
+    if 'current_level' not in progress:
+        unlocked = [int(level_id) for level_id, level in levels.items() if level.get('is_unlocked') and level_id.isdigit()]
+        defaults['progress.current_level'] = max(unlocked, default=1)
+    if 'sid' not in student:
+        defaults['sid'] = str(uuid.uuid4())[:8].upper()
+    if 'nickname' not in student:
+        defaults['nickname'] = ''
+    if 'email' not in student:
+        defaults['email'] = ''
+    return defaults
+
+def auth_emails(uids: list) -> dict:
+    auth = get_auth()
+    emails = {}
+    for start in range(0, len(uids), AUTH_LOOKUP_LIMIT):
+        identifiers = [auth.UidIdentifier(uid) for uid in uids[start:start + AUTH_LOOKUP_LIMIT]]
+        for user in auth.get_users(identifiers).users:
+            emails[user.uid] = user.email or ''
+    return emails
+
+def main():
+    parser = argparse.ArgumentParser(description="Reserve the nicknames of existing students and fill in their listing fields")
+    parser.add_argument("--dry-run", action="store_true", help="report what would be written")
+    args = parser.parse_args()
+
+    db = get_db()
+    owners = {
+        doc.id: doc.to_dict().get('uid')
+        for doc in db.collection(NICKNAMES_COLLECTION).select(['uid']).stream()
+    }
+
+    missing, duplicates, incomplete = [], [], {}
+    for student in db.collection('students').select(['sid', 'email', 'nickname', 'progress']).stream():
+        student_data = student.to_dict() or {}
+        defaults = sort_field_defaults(student_data)
+        if defaults:
+            incomplete[student.id] = defaults
+        nickname = student_data.get('nickname')
+        if not nickname:
+            continue
+        key = reservation_id(nickname)
+        if key not in owners:
+            owners[key] = student.id
+            missing.append((key, student.id, nickname))
+        elif owners[key] != student.id:
+            duplicates.append((student.id, nickname, owners[key]))
+
+    without_email = [uid for uid, defaults in incomplete.items() if 'email' in defaults]
+    if without_email:
+        for uid, email in auth_emails(without_email).items():
+            incomplete[uid]['email'] = email
+
+    if not args.dry_run:
+        # (batch method, document, data)
+        writes = [
+            ('set', db.collection(NICKNAMES_COLLECTION).document(key), {'uid': uid, 'nickname': nickname})
+            for key, uid, nickname in missing
+        ] + [
+            ('update', db.collection('students').document(uid), defaults)
+            for uid, defaults in incomplete.items()
+        ]
+        for start in range(0, len(writes), BATCH_SIZE):
+            batch = db.batch()
+            for method, reference, data in writes[start:start + BATCH_SIZE]:
+                getattr(batch, method)(reference, data)
+            batch.commit()
+        # Signups stop looking nicknames up in the students collection once this exists
+        backfill_ref(db).set({'completed_at': datetime.utcnow().isoformat(), 'reserved': len(missing)})
+
+    for uid, nickname, owner in duplicates:
+        print(f"⚠️ {uid}: nickname '{nickname}' is already reserved by {owner}")
+    action = "Would reserve" if args.dry_run else "Reserved"
+    print(f"✅ {action} {len(missing)} nicknames; {len(duplicates)} duplicates left as they are")
+    action = "Would fill in" if args.dry_run else "Filled in"
+    print(f"✅ {action} listing fields of {len(incomplete)} students")
+
+if __name__ == "__main__":
+    main()
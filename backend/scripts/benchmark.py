@@ -0,0 +1,176 @@
+# Offline inference benchmark for the handwriting pipeline.
+# Run from the backend directory; needs only the models in intelligence/:
+#   python -m scripts.benchmark
+#   python -m scripts.benchmark --backends keras-fused,numpy --rounds 50 --output results.json
+#
+# Every backend runs in its own spawned process so import time and peak RSS are not
+# shared between them. Results are written as JSON for run-to-run comparison.
+
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime
+
+import numpy as np
+
+WORD_LENGTHS = range(3, 10)
+
+# Every setting scripts/inference.py reads, at its default. Each backend starts from these
+# plus its own "env", so nothing leaks in from the caller's environment.
+BASE_ENV = {
+    "INFERENCE_BACKEND": "keras",
+    "INFERENCE_PRECISION": "float32",
+    "INFERENCE_MODE": "full",
+    "CASCADE_MARGIN_THRESHOLD": "0.9",
+    "CASCADE_MIN_MODELS": "1",
+    "PREPROCESS_BUFFER_POOL_SIZE": "16",
+}
+
+# env: settings changed from BASE_ENV; predictor: how a word is predicted
+BACKENDS = {
+    # The pre-batching path: model.predict per character per fold
+    "keras-per-character": {"env": {"INFERENCE_BACKEND": "keras"}, "predictor": "per_character", "max_rounds": 3},
+    # All characters at once, but five separate model calls averaged in Python
+    "keras-batched": {"env": {"INFERENCE_BACKEND": "keras"}, "predictor": "soft_vote"},
+    "keras-fused": {"env": {"INFERENCE_BACKEND": "keras", "INFERENCE_MODE": "full"}},
+    "keras-cascade": {"env": {"INFERENCE_BACKEND": "keras", "INFERENCE_MODE": "cascade"}},
+    "numpy": {"env": {"INFERENCE_BACKEND": "numpy", "INFERENCE_MODE": "full"}},
+    "numpy-cascade": {"env": {"INFERENCE_BACKEND": "numpy", "INFERENCE_MODE": "cascade"}},
+    "numpy-float16": {"env": {"INFERENCE_BACKEND": "numpy", "INFERENCE_PRECISION": "float16"}},
+    "numpy-int8": {"env": {"INFERENCE_BACKEND": "numpy", "INFERENCE_PRECISION": "int8"}},
+}
+
+def percentiles(samples: list[float]) -> dict:
+    return {
+        "p50_ms": float(np.percentile(samples, 50)),
+        "p95_ms": float(np.percentile(samples, 95)),
+        "p99_ms": float(np.percentile(samples, 99)),
+        "mean_ms": float(np.mean(samples)),
+    }
+
+# Runs inside the spawned process for one backend
+def run_backend(name: str, rounds: int, concurrency: list[int], requests: int, seed: int) -> dict:
+    spec = BACKENDS[name]
+    env = {**BASE_ENV, **spec["env"]}
+    os.environ.update(env)
+    rounds = min(rounds, spec.get("max_rounds", rounds))
+
+    started = time.perf_counter()
+    from scripts import inference
+    import_s = time.perf_counter() - started
+
+    started = time.perf_counter()
+    ensemble = inference.get_ensemble()
+    load_s = time.perf_counter() - started
+
+    from scripts.synthetic_characters import random_word, render_word
+
+    if spec.get("predictor") == "per_character":
+        def predict(images):
+            chars = []
+            for image in images:
+                x = inference.preprocess_image(image)
+                probs = sum(model.predict(x, verbose=0) for model in ensemble.models) / len(ensemble.models)
+                chars.extend(inference.decode_predictions(probs))
+            return ''.join(chars)
+    elif spec.get("predictor") == "soft_vote":
+        def predict(images):
+            return ''.join(inference.decode_predictions(ensemble.soft_vote(inference.preprocess_images(images))))
+    else:
+        predict = inference.predict_word_from_images
+
+    rng = np.random.default_rng(seed)
+    words = {length: [render_word(random_word(length, rng), rng) for _ in range(rounds)] for length in WORD_LENGTHS}
+
+    # First prediction pays any graph tracing; report it as part of startup
+    started = time.perf_counter()
+    predict(words[3][0])
+    first_prediction_s = time.perf_counter() - started
+
+    latency = {}
+    for length, samples in words.items():
+        timings = []
+        for images in samples:
+            started = time.perf_counter()
+            predict(images)
+            timings.append((time.perf_counter() - started) * 1000)
+        latency[str(length)] = percentiles(timings)
+
+    # N concurrent callers, each sending whole words, as the request handlers would
+    throughput = {}
+    mixed = [images for samples in words.values() for images in samples]
+    workload = [mixed[i % len(mixed)] for i in range(requests)]
+    for workers in concurrency:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            started = time.perf_counter()
+            list(pool.map(predict, workload))
+            elapsed = time.perf_counter() - started
+        throughput[str(workers)] = {
+            "requests_per_s": len(workload) / elapsed,
+            "characters_per_s": sum(len(images) for images in workload) / elapsed,
+        }
+
+    return {
+        "env": env,
+        "rounds": rounds,
+        "startup": {"import_s": import_s, "load_s": load_s, "first_prediction_s": first_prediction_s},
+        "latency_by_word_length": latency,
+        "throughput_by_concurrency": throughput,
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "tensorflow_loaded": "tensorflow" in sys.modules,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark handwriting inference backends offline")
+    parser.add_argument("--backends", default=",".join(BACKENDS), help="comma-separated subset of: " + ", ".join(BACKENDS))
+    parser.add_argument("--rounds", type=int, default=30, help="words timed per word length")
+    parser.add_argument("--concurrency", default="1,4,16", help="comma-separated concurrent caller counts")
+    parser.add_argument("--requests", type=int, default=64, help="words sent per throughput run")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="benchmark_results.json")
+    args = parser.parse_args()
+
+    names = [name.strip() for name in args.backends.split(",") if name.strip()]
+    unknown = [name for name in names if name not in BACKENDS]
+    if unknown:
+        raise SystemExit(f"Unknown backend(s): {', '.join(unknown)}")
+    concurrency = [int(n) for n in args.concurrency.split(",")]
+
+    context = multiprocessing.get_context("spawn")
+    results = {}
+    for name in names:
+        print(f"Benchmarking {name}...", flush=True)
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+            try:
+                results[name] = pool.submit(run_backend, name, args.rounds, concurrency, args.requests, args.seed).result()
+            except Exception as e:
+                # e.g. quantized weights not built yet; keep the other backends' results
+                results[name] = {"error": str(e)}
+                print(f"  failed: {e}")
+                continue
+        r = results[name]
+        p50 = {length: round(stats["p50_ms"], 1) for length, stats in r["latency_by_word_length"].items()}
+        best = max(t["characters_per_s"] for t in r["throughput_by_concurrency"].values())
+        print(f"  startup {r['startup']['import_s'] + r['startup']['load_s'] + r['startup']['first_prediction_s']:.1f}s, "
+              f"p50 ms by length {p50}, best {best:.0f} chars/s, peak RSS {r['peak_rss_mb']:.0f}MB")
+
+    report = {
+        "generated_at": datetime.utcnow().isoformat(),
+        "platform": platform.platform(),
+        "python": platform.python_version(),
+        "cpu_count": os.cpu_count(),
+        "settings": {"rounds": args.rounds, "concurrency": concurrency, "requests": args.requests, "seed": args.seed},
+        "results": results,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"✅ Results written to {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+# Compare the per-image preprocessing path with the pooled in-place batch path.
+# Run from the backend directory: python -m scripts.benchmark_preprocessing
+
+import time
+import tracemalloc
+
+import numpy as np
+
+from scripts.inference import BufferPool, preprocess_image, preprocess_into
+from scripts.synthetic_characters import random_word, render_word
+
+ROUNDS = 200
+
+# The path predict_word_from_images used before: one float32 array per character, then a concatenate
+def per_image(images):
+    return np.concatenate([preprocess_image(img) for img in images], axis=0)
+
+def pooled(pool):
+    def run(images):
+        with pool.batch(len(images)) as buffer:
+            return preprocess_into(images, buffer)
+    return run
+
+def measure(fn, images) -> tuple[float, int]:
+    fn(images)
+    started = time.perf_counter()
+    for _ in range(ROUNDS):
+        fn(images)
+    elapsed_us = (time.perf_counter() - started) / ROUNDS * 1e6
+
+    tracemalloc.start()
+    fn(images)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed_us, peak
+
+def main():
+    rng = np.random.default_rng(0)
+    pool = BufferPool(size=1)
+    print(f"{'length':>6}{'per-image us':>14}{'pooled us':>12}{'speedup':>9}{'per-image peak':>16}{'pooled peak':>13}")
+    for length in range(3, 10):
+        # Uploads arrive as RGB PNGs, so the grayscale conversion is part of the cost
+        images = render_word(random_word(length, rng), rng)
+        assert np.array_equal(per_image(images), pooled(pool)(images))
+        base_us, base_peak = measure(per_image, images)
+        pool_us, pool_peak = measure(pooled(pool), images)
+        print(f"{length:>6}{base_us:>14.1f}{pool_us:>12.1f}{base_us / pool_us:>8.2f}x{base_peak:>15}B{pool_peak:>12}B")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+# Relay WebSocket broadcasts between API workers and instances (BROADCAST_BACKEND=broker).
+# Every newline-delimited frame a worker sends is forwarded to all other connected workers.
+# Run one per deployment, reachable only from the API hosts (there is no authentication):
+#   python -m scripts.broadcast_broker --host 0.0.0.0 --port 8765
+
+import argparse
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Frames waiting for one worker before that worker is disconnected as too slow
+CLIENT_QUEUE_SIZE = 1000
+# Longest frame accepted; broadcasts are small JSON objects
+MAX_FRAME_BYTES = 64 * 1024
+
+class BroadcastBroker:
+    def __init__(self, host: str = "127.0.0.1", port: int = 8765):
+        self.host = host
+        self.port = port
+        self._server = None
+        self._clients = {}
+        self._handlers = set()
+        self.forwarded = 0
+        self.dropped_clients = 0
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle, self.host, self.port, limit=MAX_FRAME_BYTES)
+        # Port 0 picks a free port; report the real one
+        self.port = self._server.sockets[0].getsockname()[1]
+        logger.info(f"Broadcast broker listening on {self.host}:{self.port}")
+
+    async def stop(self):
+        self._server.close()
+        for writer in list(self._clients):
+            writer.close()
+        # Closed connections end their handlers; let them finish cleaning up
+        await asyncio.gather(*self._handlers, return_exceptions=True)
+        await self._server.wait_closed()
+
+    async def serve_forever(self):
+        await self._server.serve_forever()
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        queue = asyncio.Queue(maxsize=CLIENT_QUEUE_SIZE)
+        self._clients[writer] = queue
+        sender = asyncio.create_task(self._send(writer, queue))
+        handler = asyncio.current_task()
+        self._handlers.add(handler)
+        logger.info(f"Worker connected from {writer.get_extra_info('peername')}. Total: {len(self._clients)}")
+        try:
+            while True:
+                frame = await reader.readline()
+                if not frame:
+                    break
+                for other, other_queue in list(self._clients.items()):
+                    if other is writer:
+                        continue
+                    try:
+                        other_queue.put_nowait(frame)
+                        self.forwarded += 1
+                    except asyncio.QueueFull:
+                        logger.warning("Disconnecting a worker that is not reading broadcasts")
+                        self.dropped_clients += 1
+                        self._clients.pop(other, None)
+                        other.close()
+        except (OSError, ValueError) as e:
+            # ValueError: a frame longer than MAX_FRAME_BYTES
+            logger.warning(f"Worker connection failed: {e}")
+        finally:
+            self._clients.pop(writer, None)
+            self._handlers.discard(handler)
+            sender.cancel()
+            writer.close()
+            logger.info(f"Worker disconnected. Total: {len(self._clients)}")
+
+    async def _send(self, writer: asyncio.StreamWriter, queue: asyncio.Queue):
+        try:
+            while True:
+                writer.write(await queue.get())
+                await writer.drain()
+        except OSError:
+            writer.close()
+
+async def serve(host: str, port: int):
+    broker = BroadcastBroker(host, port)
+    await broker.start()
+    await broker.serve_forever()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Relay WebSocket broadcasts between API workers")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(serve(args.host, args.port))
@@ -0,0 +1,131 @@
+# Verify broker broadcasts between two workers against a local broker, including their
+# leaderboard indexes, malformed and out-of-order frames and a broker restart. Needs no Firebase or
+# network access beyond localhost.
+# Run from the backend directory: python -m scripts.check_broadcast_broker
+
+import asyncio
+import json
+
+from broadcast_backend import BrokerBroadcast
+from leaderboard_index import LeaderboardIndex
+from scripts.broadcast_broker import BroadcastBroker
+from websocket_manager import ConnectionManager
+
+class RecordingWebSocket:
+    """Stands in for a connected client and keeps what it was sent"""
+
+    client = None
+
+    def __init__(self):
+        self.received = []
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, message: str):
+        self.received.append(json.loads(message))
+
+    async def close(self, code: int):
+        pass
+
+async def wait_for(condition, timeout: float = 5.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not condition():
+        if asyncio.get_running_loop().time() > deadline:
+            return False
+        await asyncio.sleep(0.01)
+    return True
+
+def check(passed: bool, failure: str):
+    if not passed:
+        raise SystemExit(f"❌ {failure}")
+
+async def main():
+    broker = BroadcastBroker("127.0.0.1", 0)
+    await broker.start()
+    # Stands in for Firestore: uid -> (nickname, total_stars), as routes/student.py commits them
+    stored = {}
+    # Separate indexes, as separate worker processes would have, re-seeded from `stored`
+    # on every connect as main.py does
+    indexes = [LeaderboardIndex() for _ in range(2)]
+    workers = [ConnectionManager(BrokerBroadcast("127.0.0.1", broker.port), index) for index in indexes]
+    for worker in workers:
+        async def reseed(index=worker.index):
+            index.begin_seed()
+            await asyncio.sleep(0)
+            index.seed([(uid, nickname, total_stars) for uid, (nickname, total_stars) in stored.items()])
+        worker.backend.on_connect(reseed)
+
+    async def award(worker, uid, nickname, total_stars):
+        stored[uid] = (nickname, total_stars)
+        await worker.broadcast_score_update({"user_id": uid, "nickname": nickname, "total_stars": total_stars})
+    clients = [RecordingWebSocket() for _ in workers]
+    for worker, client in zip(workers, clients):
+        await worker.start()
+        await worker.connect_leaderboard(client)
+    check(await wait_for(lambda: all(worker.backend.connected and worker.index.ready for worker in workers)), "workers did not connect")
+
+    # A broadcast on one worker reaches clients on both, exactly once each
+    await workers[0].broadcast_leaderboard_update([{"uid": "a", "total_stars": 3}])
+    check(await wait_for(lambda: all(client.received for client in clients)), "broadcast did not reach the other worker")
+    await asyncio.sleep(0.2)
+    check([len(client.received) for client in clients] == [1, 1], f"duplicate delivery: {[client.received for client in clients]}")
+    print("broadcast reaches every worker once")
+
+    # Frames of the wrong shape are counted and skipped; the workers keep receiving
+    reader, writer = await asyncio.open_connection("127.0.0.1", broker.port)
+    for frame in ('not json', '[1]', '{"origin": "x", "channel": "score_updates", "message": [1]}',
+                  '{"origin": "x", "channel": 5, "message": {}}'):
+        writer.write(frame.encode() + b"\n")
+    await writer.drain()
+    check(await wait_for(lambda: all(worker.backend.metrics()["malformed"] == 4 for worker in workers)), "malformed frames were not skipped")
+    writer.close()
+    await workers[0].broadcast_leaderboard_update([{"uid": "d", "total_stars": 2}])
+    check(await wait_for(lambda: clients[1].received[-1] == {"top5": [{"uid": "d", "total_stars": 2}]}), "broadcast lost after malformed frames")
+    check(all(worker.backend.connected for worker in workers), "a malformed frame dropped the broker connection")
+    print("malformed frames are skipped")
+
+    # Score changes and deletions on one worker reach every worker's leaderboard index
+    await award(workers[0], "e", "Eve", 4)
+    check(await wait_for(lambda: indexes[1].top(1) == [{"uid": "e", "nickname": "Eve", "total_stars": 4}]), "score change missing from the other worker's index")
+    await workers[1].broadcast_students_removed(["e"])
+    del stored["e"]
+    check(await wait_for(lambda: not indexes[0].top(1)), "deleted student still in the other worker's index")
+    check(not indexes[1].top(1), "deleted student still in the publishing worker's index")
+    print("leaderboard indexes stay in step")
+
+    # Frames from different workers can arrive out of order: an older, lower total and a
+    # score change for a student deleted meanwhile are both ignored
+    await award(workers[0], "f", "Fay", 3)
+    check(await wait_for(lambda: indexes[1].get("f") is not None), "score change missing from the other worker's index")
+    for index in indexes:
+        index.update("f", "Fay", 2)
+        index.update("e", "Eve", 5)
+    check(all(index.top(2) == [{"uid": "f", "nickname": "Fay", "total_stars": 3}] for index in indexes),
+          f"late frames changed the leaderboard: {[index.top(2) for index in indexes]}")
+    print("out-of-order score changes are ignored")
+
+    # With the broker down, local clients still get updates; workers reconnect when it is back
+    port = broker.port
+    await broker.stop()
+    check(await wait_for(lambda: not any(worker.backend.connected for worker in workers)), "workers did not notice the broker going away")
+    await workers[1].broadcast_leaderboard_update([{"uid": "b", "total_stars": 1}])
+    check(await wait_for(lambda: clients[1].received[-1] == {"top5": [{"uid": "b", "total_stars": 1}]}), "local delivery failed without the broker")
+    # Worker 0 never receives this change; it must come back through the re-seed
+    await award(workers[1], "g", "Gus", 6)
+    check(indexes[0].get("g") is None, "a change reached the other worker without the broker")
+    broker = BroadcastBroker("127.0.0.1", port)
+    await broker.start()
+    check(await wait_for(lambda: all(worker.backend.connected for worker in workers), timeout=15), "workers did not reconnect")
+    await workers[1].broadcast_leaderboard_update([{"uid": "c", "total_stars": 5}])
+    check(await wait_for(lambda: clients[0].received[-1] == {"top5": [{"uid": "c", "total_stars": 5}]}), "broadcast lost after reconnecting")
+    check(await wait_for(lambda: indexes[0].get("g") == {"uid": "g", "nickname": "Gus", "total_stars": 6}), "a change made during the outage is missing after reconnecting")
+    print("workers reconnect and re-seed after a broker restart")
+
+    for worker in workers:
+        await worker.stop()
+    await broker.stop()
+    print("✅ Broker broadcasts work across workers.")
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,19 @@
+# Verify the fused ensemble graph against Python-side soft voting.
+# Run from the backend directory: python -m scripts.check_fused_ensemble
+
+import numpy as np
+from scripts.inference import predict_probabilities, soft_vote_probabilities
+
+TOLERANCE = 1e-5
+
+rng = np.random.default_rng(42)
+for batch_size in (1, 3, 9, 32):
+    batch = rng.random((batch_size, 32, 32, 1), dtype=np.float32)
+    fused = predict_probabilities(batch)
+    voted = soft_vote_probabilities(batch)
+    max_diff = float(np.abs(fused - voted).max())
+    if max_diff > TOLERANCE or not np.array_equal(fused.argmax(axis=1), voted.argmax(axis=1)):
+        raise SystemExit(f"❌ Fused ensemble diverges for batch of {batch_size}: max diff {max_diff:.2e}")
+    print(f"batch {batch_size}: max diff {max_diff:.2e}")
+
+print("✅ Fused ensemble matches soft voting.")
@@ -0,0 +1,88 @@
+# Verify the in-memory backend's transactions against the installed google-cloud-firestore.
+# MemoryTransaction implements the private protocol firestore.async_transactional drives
+# (_begin, _commit, _rollback, _clean_up, _max_attempts, ...), so run this after changing
+# the version pinned in requirements.txt. Needs no Firebase credentials.
+# Run from the backend directory: python -m scripts.check_memory_backend
+
+import asyncio
+
+from memory_backend import MemoryClient
+from progress import _award_task, award_task, new_level_progress, StudentNotFound
+
+class ConflictingClient(MemoryClient):
+    """Changes a student right after a transaction reads it, `conflicts` times, so the
+    commit aborts and async_transactional has to retry"""
+
+    def __init__(self, conflicts: int):
+        super().__init__()
+        self.conflicts = conflicts
+
+    def _read(self, reference, field_paths, transaction):
+        snapshot = super()._read(reference, field_paths, transaction)
+        if transaction is not None and self.conflicts and reference._collection == 'students':
+            self.conflicts -= 1
+            self._commit([('update', reference, {'touched': self.conflicts}, False)])
+        return snapshot
+
+def add_student(db: MemoryClient, uid: str):
+    db._commit([('set', db.collection('students').document(uid), {
+        'uid': uid,
+        'nickname': uid,
+        'progress': {'current_level': 1, 'total_stars': 0, 'levels': {'1': new_level_progress(1)}},
+    }, False)])
+
+def total_stars(db: MemoryClient, uid: str) -> int:
+    return db._read(db.collection('students').document(uid), None, None).to_dict()['progress']['total_stars']
+
+def check(passed: bool, failure: str):
+    if not passed:
+        raise SystemExit(f"❌ {failure}")
+
+async def main():
+    db = MemoryClient()
+    add_student(db, 'a')
+    result = await award_task(db, 'a', 1, 1)
+    check(result['updated'] and result['total_stars'] == 1, f"first award not applied: {result}")
+    result = await award_task(db, 'a', 1, 1)
+    check(not result['updated'] and total_stars(db, 'a') == 1, f"repeated award counted twice: {result}")
+    print("awards commit once")
+
+    # Concurrent awards of different tasks all land
+    await asyncio.gather(*(award_task(db, 'a', 1, task_id) for task_id in range(2, 10)))
+    check(total_stars(db, 'a') == 9, f"concurrent awards lost: {total_stars(db, 'a')} stars, expected 9")
+    print("concurrent awards all commit")
+
+    # A conflicting write aborts the commit, and async_transactional retries on fresh data
+    db = ConflictingClient(conflicts=2)
+    add_student(db, 'b')
+    result = await award_task(db, 'b', 1, 1)
+    check(result['updated'] and total_stars(db, 'b') == 1, f"award lost after a retry: {result}")
+    check(db.metrics()['aborted_transactions'] == 2, f"expected 2 aborted commits, got {db.metrics()['aborted_transactions']}")
+    print("conflicting writes are retried")
+
+    # Once max_attempts is used up the award fails with nothing written
+    db = ConflictingClient(conflicts=5)
+    add_student(db, 'c')
+    try:
+        await award_task(db, 'c', 1, 1)
+        check(False, "award committed despite conflicts on every attempt")
+    except ValueError:
+        pass
+    check(total_stars(db, 'c') == 0, "a failed award left writes behind")
+    print("exhausted retries fail cleanly")
+
+    # An error inside the transaction rolls it back and leaves it reusable
+    db = MemoryClient()
+    transaction = db.transaction()
+    try:
+        await _award_task(transaction, db, 'missing', 1, 1)
+        check(False, "award for a missing student succeeded")
+    except StudentNotFound:
+        pass
+    check(not transaction.in_progress, "transaction left in progress")
+    print("errors roll the transaction back")
+
+    print("✅ Memory transactions work with the installed google-cloud-firestore.")
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,31 @@
+# Verify the NumPy engine against the Keras fold models it was exported from.
+# Run from the backend directory: python -m scripts.check_numpy_engine
+
+import numpy as np
+from scripts.inference import KerasEnsemble
+from scripts.numpy_engine import FOLDS, NumpyEnsemble
+
+TOLERANCE = 1e-5
+
+keras_ensemble = KerasEnsemble()
+numpy_ensemble = NumpyEnsemble()
+
+rng = np.random.default_rng(42)
+for batch_size in (1, 3, 9, 32):
+    batch = rng.random((batch_size, 32, 32, 1), dtype=np.float32)
+
+    # Each fold on its own, then the averaged ensemble
+    for fold, model in enumerate(keras_ensemble.models, start=1):
+        expected = np.asarray(model(batch, training=False))
+        max_diff = float(np.abs(numpy_ensemble.predict_fold(fold, batch) - expected).max())
+        if max_diff > TOLERANCE:
+            raise SystemExit(f"❌ Fold {fold} diverges for batch of {batch_size}: max diff {max_diff:.2e}")
+
+    expected = keras_ensemble.predict(batch)
+    actual = numpy_ensemble.predict(batch)
+    max_diff = float(np.abs(actual - expected).max())
+    if max_diff > TOLERANCE or not np.array_equal(actual.argmax(axis=1), expected.argmax(axis=1)):
+        raise SystemExit(f"❌ NumPy ensemble diverges for batch of {batch_size}: max diff {max_diff:.2e}")
+    print(f"batch {batch_size}: max diff {max_diff:.2e} across {FOLDS} folds")
+
+print("✅ NumPy engine matches the Keras models.")
@@ -5,26 +5,126 @@ os.environ['TF_CPP_MIN_LOG_LEVEL'] = '2'
 os.environ['TF_ENABLE_ONEDNN_OPTS'] = '0'
 # Suppress sklearn version warning
 warnings.filterwarnings("ignore", category=UserWarning, module="sklearn")
+import logging
+import pickle
+import threading
+import time
+from contextlib import contextmanager
+from functools import lru_cache
 import numpy as np
 from PIL import Image
-from tensorflow.keras.models import load_model
-from tensorflow.keras.layers import PReLU
-from sklearn.preprocessing import LabelEncoder
-import pickle
+
+logger = logging.getLogger(__name__)
 
 backend_dir = os.path.dirname(os.path.dirname(__file__))
 model_dir = os.path.join(backend_dir, 'intelligence')
 label_encoder_path = os.path.join(model_dir, 'label_encoder.pkl')
 
-# Load label encoder
-with open(label_encoder_path, 'rb') as f:
-    le: LabelEncoder = pickle.load(f)
+# "keras" runs the fused TensorFlow graph; "numpy" runs scripts/numpy_engine.py without TensorFlow
+INFERENCE_BACKEND = os.getenv('INFERENCE_BACKEND', 'keras')
+# Weight precision for the numpy backend: "float32", "float16" or "int8" (see scripts/quantize.py)
+INFERENCE_PRECISION = os.getenv('INFERENCE_PRECISION', 'float32')
+# "full" runs every fold on every character; "cascade" stops per character once the folds agree
+INFERENCE_MODE = os.getenv('INFERENCE_MODE', 'full')
+# Cascade exit: top-1 minus top-2 of the running average probability, after at least this many folds
+CASCADE_MARGIN_THRESHOLD = float(os.getenv('CASCADE_MARGIN_THRESHOLD', '0.9'))
+CASCADE_MIN_MODELS = int(os.getenv('CASCADE_MIN_MODELS', '1'))
+# Preallocated preprocessing buffers, each large enough for the longest task word
+PREPROCESS_BUFFER_POOL_SIZE = int(os.getenv('PREPROCESS_BUFFER_POOL_SIZE', '16'))
+MAX_WORD_LENGTH = 9
+
+# Load label encoder on first use; unpickling it imports scikit-learn
+@lru_cache(maxsize=1)
+def get_label_encoder():
+    with open(label_encoder_path, 'rb') as f:
+        return pickle.load(f)
+
+# TensorFlow and the fold models are loaded on first use (or by warm_up), not at import
+class KerasEnsemble:
+    def __init__(self):
+        import tensorflow as tf
+        from tensorflow.keras import Input, Model
+        from tensorflow.keras.models import load_model
+        from tensorflow.keras.layers import Average, PReLU
+
+        self.tf = tf
+        self.models = [
+            load_model(os.path.join(model_dir, f'model_fold_{i}.keras'), custom_objects={'PReLU': PReLU})
+            for i in range(1, 6)
+        ]
+        self.folds = len(self.models)
+        signature = [tf.TensorSpec(shape=(None, 32, 32, 1), dtype=tf.float32)]
+
+        # Fuse the fold models into one graph: shared input, in-graph soft voting
+        inputs = Input(shape=(32, 32, 1), name='character')
+        outputs = Average(name='soft_vote')([model(inputs) for model in self.models])
+        self.fused_ensemble = Model(inputs, outputs, name='fused_ensemble')
+
+        # Traced once; the unknown batch dimension keeps word length from retracing
+        self.fused_predict = tf.function(
+            lambda batch: self.fused_ensemble(batch, training=False),
+            input_signature=signature,
+            autograph=False,
+        )
+
+        # One traced graph per fold for the cascade
+        self.fold_predicts = [
+            tf.function(lambda batch, model=model: model(batch, training=False), input_signature=signature, autograph=False)
+            for model in self.models
+        ]
+
+    # Soft voting over a batch as a single dispatch of the fused graph
+    def predict(self, batch: np.ndarray) -> np.ndarray:
+        return self.fused_predict(self.tf.convert_to_tensor(batch, dtype=self.tf.float32)).numpy()
+
+    # Soft voting over a batch: one forward pass per model, averaged in Python
+    def soft_vote(self, batch: np.ndarray) -> np.ndarray:
+        return sum(np.asarray(model(batch, training=False)) for model in self.models) / len(self.models)
+
+    # Probabilities from a single fold model (1-based, like the file names)
+    def predict_fold(self, fold: int, batch: np.ndarray) -> np.ndarray:
+        return self.fold_predicts[fold - 1](self.tf.convert_to_tensor(batch, dtype=self.tf.float32)).numpy()
+
+def build_ensemble(backend: str, precision: str = 'float32'):
+    if backend == 'keras':
+        if precision != 'float32':
+            raise ValueError("Reduced-precision weights are served by the numpy backend")
+        return KerasEnsemble()
+    if backend == 'numpy':
+        from scripts.numpy_engine import NumpyEnsemble
+        return NumpyEnsemble(precision)
+    raise ValueError(f"Unknown inference backend: {backend}")
+
+_ensemble = None
+_ensemble_lock = threading.Lock()
+
+def get_ensemble():
+    global _ensemble
+    if _ensemble is None:
+        with _ensemble_lock:
+            if _ensemble is None:
+                started = time.perf_counter()
+                _ensemble = build_ensemble(INFERENCE_BACKEND, INFERENCE_PRECISION)
+                logger.info(
+                    f"Loaded {INFERENCE_BACKEND} ({INFERENCE_PRECISION}) ensemble "
+                    f"in {time.perf_counter() - started:.1f}s"
+                )
+    return _ensemble
 
-# Load ensemble models
-models = [
-    load_model(os.path.join(model_dir, f'model_fold_{i}.keras'), custom_objects={'PReLU': PReLU})
-    for i in range(1, 6)
-]
+def is_loaded() -> bool:
+    return _ensemble is not None
+
+# Load the models and trace the fused graph so the first request pays neither cost
+def warm_up():
+    started = time.perf_counter()
+    get_label_encoder()
+    ensemble = get_ensemble()
+    warm_batch = np.zeros((1, 32, 32, 1), dtype='float32')
+    ensemble.predict(warm_batch)
+    if INFERENCE_MODE == 'cascade':
+        for fold in range(1, ensemble.folds + 1):
+            ensemble.predict_fold(fold, warm_batch)
+    logger.info(f"Inference warm-up finished in {time.perf_counter() - started:.1f}s")
 
 # Preprocess
 def preprocess_image(image: Image.Image) -> np.ndarray:
@@ -32,13 +132,113 @@ def preprocess_image(image: Image.Image) -> np.ndarray:
     img = np.array(img, dtype='float32') / 255.0
     return img.reshape(1, 32, 32, 1)
 
+# Preprocess every character straight into out[:len(images)], normalizing in place
+def preprocess_into(images: list[Image.Image], out: np.ndarray) -> np.ndarray:
+    for i, image in enumerate(images):
+        out[i, :, :, 0] = np.asarray(image.convert('L').resize((32, 32), Image.Resampling.LANCZOS))
+    batch = out[:len(images)]
+    np.divide(batch, 255.0, out=batch)
+    return batch
+
+# Preprocess a list of character images into one (N, 32, 32, 1) batch
+def preprocess_images(images: list[Image.Image]) -> np.ndarray:
+    return preprocess_into(images, np.empty((len(images), 32, 32, 1), dtype='float32'))
+
+# Reusable (MAX_WORD_LENGTH, 32, 32, 1) float32 buffers shared across requests
+class BufferPool:
+    def __init__(self, size: int, capacity: int = MAX_WORD_LENGTH):
+        self.size = size
+        self.capacity = capacity
+        self._free = [np.empty((capacity, 32, 32, 1), dtype='float32') for _ in range(size)]
+        self._lock = threading.Lock()
+        self._reused = 0
+        self._allocated = 0
+
+    @contextmanager
+    def batch(self, length: int):
+        """Yield a (length, 32, 32, 1) view; its contents must not be used after the block"""
+        buffer = None
+        if length <= self.capacity:
+            with self._lock:
+                if self._free:
+                    buffer = self._free.pop()
+                    self._reused += 1
+        if buffer is None:
+            # Pool exhausted or oversized word: fall back to a fresh buffer
+            buffer = np.empty((max(length, self.capacity), 32, 32, 1), dtype='float32')
+            with self._lock:
+                self._allocated += 1
+        try:
+            yield buffer[:length]
+        finally:
+            if buffer.shape[0] == self.capacity:
+                with self._lock:
+                    if len(self._free) < self.size:
+                        self._free.append(buffer)
+
+    def metrics(self) -> dict:
+        return {
+            "size": self.size,
+            "free": len(self._free),
+            "reused": self._reused,
+            "allocated": self._allocated,
+        }
+
+buffer_pool = BufferPool(PREPROCESS_BUFFER_POOL_SIZE)
+
+def soft_vote_probabilities(batch: np.ndarray) -> np.ndarray:
+    return get_ensemble().soft_vote(batch)
+
+def predict_probabilities(batch: np.ndarray) -> np.ndarray:
+    return get_ensemble().predict(batch)
+
+# Early-exit soft voting: folds run one after another, and each character leaves the
+# cascade once its running average is confident; only ambiguous ones reach later folds
+def predict_probabilities_cascade(
+    batch: np.ndarray,
+    threshold: float = CASCADE_MARGIN_THRESHOLD,
+    min_models: int = CASCADE_MIN_MODELS,
+) -> tuple[np.ndarray, np.ndarray]:
+    ensemble = get_ensemble()
+    totals = None
+    counts = np.zeros(len(batch), dtype=np.int64)
+    active = np.arange(len(batch))
+
+    for fold in range(1, ensemble.folds + 1):
+        probs = ensemble.predict_fold(fold, batch[active])
+        if totals is None:
+            totals = np.zeros((len(batch), probs.shape[1]), dtype=probs.dtype)
+        totals[active] += probs
+        counts[active] += 1
+
+        if fold >= min_models:
+            running = totals[active] / counts[active, None]
+            top_two = np.partition(running, -2, axis=1)[:, -2:]
+            active = active[top_two[:, 1] - top_two[:, 0] < threshold]
+        if len(active) == 0:
+            break
+
+    return totals / counts[:, None], counts
+
+# Entry point for the inference workers: averaged probabilities plus the number
+# of fold evaluations spent, so callers can report models per character
+def run_batch(batch: np.ndarray) -> tuple[np.ndarray, int]:
+    if INFERENCE_MODE == 'cascade':
+        probs, counts = predict_probabilities_cascade(batch)
+        return probs, int(counts.sum())
+    return predict_probabilities(batch), len(batch) * get_ensemble().folds
+
+# Decode averaged probabilities into characters
+def decode_predictions(probs: np.ndarray) -> list[str]:
+    return list(get_label_encoder().inverse_transform(np.argmax(probs, axis=1)))
+
 # Predict one character
 def predict_character(image: Image.Image) -> str:
-    img_array = preprocess_image(image)
-    avg_pred = sum(model.predict(img_array, verbose=0) for model in models) / len(models)
-    predicted_label = np.argmax(avg_pred)
-    return le.inverse_transform([predicted_label])[0]
+    return decode_predictions(predict_probabilities(preprocess_image(image)))[0]
 
 # Predict full word from list of character images
 def predict_word_from_images(images: list[Image.Image]) -> str:
-    return ''.join(predict_character(img) for img in images)
\ No newline at end of file
+    if not images:
+        return ''
+    probs, _ = run_batch(preprocess_images(images))
+    return ''.join(decode_predictions(probs))
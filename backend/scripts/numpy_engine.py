@@ -0,0 +1,174 @@
+# TensorFlow-free forward pass for the LeNet-style fold models (build_model in
+# models/lenet5_htr_pipeline.py). Weights are read once from the .keras files and
+# cached in a compact .npz; the network then runs as batched NumPy matmuls.
+#
+# Export the weights ahead of time from the backend directory:
+#   python -m scripts.numpy_engine
+
+import io
+import logging
+import os
+import tempfile
+import zipfile
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+logger = logging.getLogger(__name__)
+
+backend_dir = os.path.dirname(os.path.dirname(__file__))
+model_dir = os.path.join(backend_dir, 'intelligence')
+weights_path = os.path.join(model_dir, 'ensemble_weights.npz')
+
+FOLDS = 5
+PRECISIONS = ('float32', 'float16', 'int8')
+
+# Layer names inside model.weights.h5, in build_model order
+CONV_LAYERS = [('conv2d', 'same', 'p_re_lu'), ('conv2d_1', 'same', 'p_re_lu_1'), ('conv2d_2', 'valid', 'p_re_lu_2')]
+DENSE_LAYERS = [('dense', 'p_re_lu_3'), ('dense_1', 'p_re_lu_4'), ('dense_2', None)]
+
+# Read every fold's weights straight out of the .keras archives (no TensorFlow needed)
+def read_keras_weights() -> dict[str, np.ndarray]:
+    import h5py
+
+    weights = {}
+    for fold in range(1, FOLDS + 1):
+        keras_path = os.path.join(model_dir, f'model_fold_{fold}.keras')
+        with zipfile.ZipFile(keras_path) as archive:
+            h5_bytes = archive.read('model.weights.h5')
+        with h5py.File(io.BytesIO(h5_bytes), 'r') as h5:
+            layers = h5['layers']
+            for name, _, prelu in CONV_LAYERS:
+                weights[f'fold_{fold}/{name}/kernel'] = layers[name]['vars']['0'][()]
+                weights[f'fold_{fold}/{name}/bias'] = layers[name]['vars']['1'][()]
+                weights[f'fold_{fold}/{prelu}/alpha'] = layers[prelu]['vars']['0'][()]
+            for name, prelu in DENSE_LAYERS:
+                weights[f'fold_{fold}/{name}/kernel'] = layers[name]['vars']['0'][()]
+                weights[f'fold_{fold}/{name}/bias'] = layers[name]['vars']['1'][()]
+                if prelu:
+                    weights[f'fold_{fold}/{prelu}/alpha'] = layers[prelu]['vars']['0'][()]
+    return weights
+
+def keras_paths() -> list[str]:
+    return [os.path.join(model_dir, f'model_fold_{fold}.keras') for fold in range(1, FOLDS + 1)]
+
+# Written to a temporary file and renamed into place, so process-pool workers exporting
+# at the same time never read a partial file
+# Written to a temporary file and renamed, so a reader never sees a partial file
+def save_weights(path: str, weights: dict):
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.npz.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            np.savez_compressed(f, **weights)
+        os.replace(temp_path, path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+
+def export_weights(path: str = weights_path) -> str:
+    save_weights(path, read_keras_weights())
+    logger.info(f"Exported ensemble weights to {path}")
+    return path
+
+def is_stale(path: str) -> bool:
+    """Missing, or older than one of the .keras files it was built from"""
+    if not os.path.exists(path):
+        return True
+    return any(os.path.getmtime(keras_path) > os.path.getmtime(path) for keras_path in keras_paths())
+
+# Reduced-precision files are written by scripts/quantize.py alongside the float32 export
+def weights_path_for(precision: str) -> str:
+    if precision not in PRECISIONS:
+        raise ValueError(f"Unknown weight precision: {precision}")
+    if precision == 'float32':
+        return weights_path
+    return os.path.join(model_dir, f'ensemble_weights_{precision}.npz')
+
+def load_weights(path: str = weights_path) -> dict[str, np.ndarray]:
+    if path == weights_path:
+        # Re-exported when a fold was retrained, so new .keras files are never ignored
+        if is_stale(path):
+            export_weights(path)
+    elif not os.path.exists(path):
+        # Never quantize implicitly: the conversion tool also runs the accuracy report
+        raise FileNotFoundError(f"{path} not found; run python -m scripts.quantize first")
+    elif is_stale(path):
+        logger.warning(f"{path} is older than the .keras models; rerun python -m scripts.quantize")
+    with np.load(path) as data:
+        return {key: data[key] for key in data.files}
+
+def conv2d(x: np.ndarray, kernel: np.ndarray, bias: np.ndarray, padding: str) -> np.ndarray:
+    kh, kw, channels, filters = kernel.shape
+    if padding == 'same':
+        x = np.pad(x, ((0, 0), (kh // 2, kh // 2), (kw // 2, kw // 2), (0, 0)))
+    # im2col: (N, H, W, C, kh, kw) windows -> (N*H*W, kh*kw*C) rows, then one matmul
+    windows = sliding_window_view(x, (kh, kw), axis=(1, 2))
+    n, h, w = windows.shape[:3]
+    cols = windows.transpose(0, 1, 2, 4, 5, 3).reshape(n * h * w, kh * kw * channels)
+    out = cols @ kernel.reshape(kh * kw * channels, filters)
+    out += bias
+    return out.reshape(n, h, w, filters)
+
+# In place: x is always a fresh layer output, so max(x, 0) + alpha * min(x, 0) can reuse it
+def prelu(x: np.ndarray, alpha: np.ndarray) -> np.ndarray:
+    negative = np.minimum(x, 0)
+    np.maximum(x, 0, out=x)
+    negative *= alpha
+    x += negative
+    return x
+
+def max_pool(x: np.ndarray) -> np.ndarray:
+    n, h, w, c = x.shape
+    x = x[:, :h // 2 * 2, :w // 2 * 2]
+    return x.reshape(n, h // 2, 2, w // 2, 2, c).max(axis=(2, 4))
+
+def softmax(x: np.ndarray) -> np.ndarray:
+    e = np.exp(x - x.max(axis=1, keepdims=True))
+    return e / e.sum(axis=1, keepdims=True)
+
+class NumpyEnsemble:
+    folds = FOLDS
+
+    def __init__(self, precision: str = 'float32'):
+        self.precision = precision
+        self.weights = load_weights(weights_path_for(precision))
+
+    # Reduced-precision weights stay compact in memory and are widened per layer;
+    # the arithmetic itself is always float32
+    def _get(self, fold: int, layer: str, var: str) -> np.ndarray:
+        key = f'fold_{fold}/{layer}/{var}'
+        value = self.weights[key]
+        if value.dtype == np.int8:
+            return value.astype(np.float32) * self.weights[f'{key}_scale']
+        if value.dtype == np.float16:
+            return value.astype(np.float32)
+        return value
+
+    @property
+    def weights_bytes(self) -> int:
+        return sum(value.nbytes for value in self.weights.values())
+
+    # Forward pass of a single fold model over a (N, 32, 32, 1) batch
+    def predict_fold(self, fold: int, batch: np.ndarray) -> np.ndarray:
+        x = np.asarray(batch, dtype=np.float32)
+        for name, padding, prelu_name in CONV_LAYERS:
+            x = conv2d(x, self._get(fold, name, 'kernel'), self._get(fold, name, 'bias'), padding)
+            x = max_pool(prelu(x, self._get(fold, prelu_name, 'alpha')))
+        # Flatten in channels_last order, as Keras does
+        x = x.reshape(len(x), -1)
+        for name, prelu_name in DENSE_LAYERS:
+            x = x @ self._get(fold, name, 'kernel')
+            x += self._get(fold, name, 'bias')
+            if prelu_name:
+                x = prelu(x, self._get(fold, prelu_name, 'alpha'))
+        return softmax(x)
+
+    def predict(self, batch: np.ndarray) -> np.ndarray:
+        return sum(self.predict_fold(fold, batch) for fold in range(1, FOLDS + 1)) / FOLDS
+
+    # Python-side averaging is the only path here, so soft voting is the same pass
+    soft_vote = predict
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    export_weights()
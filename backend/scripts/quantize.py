@@ -0,0 +1,139 @@
+# Convert the fold weights to reduced precision and report what it costs.
+# Run from the backend directory:
+#   python -m scripts.quantize                          # synthetic held-out set
+#   python -m scripts.quantize --images path/to/heldout # DIR/A/*.png, DIR/B/*.png, ...
+# Serve a variant with INFERENCE_BACKEND=numpy INFERENCE_PRECISION=float16 (or int8).
+
+import argparse
+import json
+import multiprocessing
+import os
+import resource
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from scripts.numpy_engine import PRECISIONS, load_weights, save_weights, weights_path, weights_path_for
+
+# float16: plain cast. int8: symmetric, one scale per output channel of every kernel;
+# biases and PReLU alphas are small and stay float32.
+def quantize_weights(weights: dict[str, np.ndarray], precision: str) -> dict[str, np.ndarray]:
+    if precision == 'float32':
+        return dict(weights)
+    if precision == 'float16':
+        return {key: value.astype(np.float16) for key, value in weights.items()}
+    if precision == 'int8':
+        quantized = {}
+        for key, value in weights.items():
+            if not key.endswith('/kernel'):
+                quantized[key] = value
+                continue
+            scale = np.abs(value).max(axis=tuple(range(value.ndim - 1))) / 127
+            scale[scale == 0] = 1
+            quantized[key] = np.round(value / scale).astype(np.int8)
+            quantized[f'{key}_scale'] = scale.astype(np.float32)
+        return quantized
+    raise ValueError(f"Unknown weight precision: {precision}")
+
+def convert(precision: str) -> str:
+    path = weights_path_for(precision)
+    if precision != 'float32':
+        save_weights(path, quantize_weights(load_weights(weights_path), precision))
+    return path
+
+# Runs in a fresh process per variant so resident memory is not shared between them
+def evaluate_variant(precision: str, batch: np.ndarray, word_length: int) -> dict:
+    from scripts.numpy_engine import NumpyEnsemble
+
+    ensemble = NumpyEnsemble(precision)
+    ensemble.predict(batch[:1])
+
+    # Word-sized batches, as predict-task sends them
+    started = time.perf_counter()
+    probs = np.concatenate([
+        ensemble.predict(batch[i:i + word_length]) for i in range(0, len(batch), word_length)
+    ])
+    per_char_ms = (time.perf_counter() - started) / len(batch) * 1000
+
+    single = []
+    for i in range(min(len(batch), 100)):
+        started = time.perf_counter()
+        ensemble.predict(batch[i:i + 1])
+        single.append((time.perf_counter() - started) * 1000)
+
+    return {
+        "precision": precision,
+        "file_bytes": os.path.getsize(weights_path_for(precision)),
+        "weights_bytes": ensemble.weights_bytes,
+        "latency_ms_per_char": per_char_ms,
+        "single_char_latency_ms_p50": float(np.percentile(single, 50)),
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "predictions": probs.argmax(axis=1).tolist(),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Quantize the ensemble and compare it against float32")
+    parser.add_argument("--precision", choices=PRECISIONS[1:], action="append",
+                        help="variant(s) to build; defaults to all")
+    parser.add_argument("--images", help="held-out directory laid out as DIR/<LABEL>/*.png")
+    parser.add_argument("--per-letter", type=int, default=20, help="synthetic images per letter without --images")
+    parser.add_argument("--word-length", type=int, default=9, help="characters per timed batch")
+    parser.add_argument("--max-accuracy-drop", type=float, default=0.01,
+                        help="fail if a variant loses more accuracy than this versus float32")
+    parser.add_argument("--output", help="write the report as JSON to this path")
+    args = parser.parse_args()
+
+    from scripts.inference import get_label_encoder, preprocess_images
+    from scripts.synthetic_characters import labelled_characters, load_labelled_directory
+
+    if args.images:
+        images, labels = load_labelled_directory(args.images)
+        source = args.images
+    else:
+        images, labels = labelled_characters(args.per_letter)
+        source = f"synthetic ({args.per_letter} per letter)"
+    batch = preprocess_images(images)
+    targets = get_label_encoder().transform(labels)
+
+    precisions = ['float32'] + (args.precision or list(PRECISIONS[1:]))
+    for precision in precisions:
+        convert(precision)
+
+    context = multiprocessing.get_context("spawn")
+    results = []
+    for precision in precisions:
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+            results.append(pool.submit(evaluate_variant, precision, batch, args.word_length).result())
+
+    baseline = np.array(results[0]["predictions"])
+    baseline_accuracy = float(np.mean(baseline == targets))
+    failed = []
+    for result in results:
+        predictions = np.array(result.pop("predictions"))
+        result["accuracy"] = float(np.mean(predictions == targets))
+        result["accuracy_drop"] = baseline_accuracy - result["accuracy"]
+        result["agreement_with_float32"] = float(np.mean(predictions == baseline))
+        if result["accuracy_drop"] > args.max_accuracy_drop:
+            failed.append(result["precision"])
+
+    print(f"Held-out set: {source}, {len(labels)} images")
+    print(f"{'precision':<10}{'accuracy':>10}{'drop':>8}{'agree':>8}{'ms/char':>9}{'p50 1ch':>9}{'weights':>10}{'file':>10}{'rss MB':>8}")
+    for r in results:
+        print(
+            f"{r['precision']:<10}{r['accuracy']:>10.4f}{r['accuracy_drop']:>8.4f}"
+            f"{r['agreement_with_float32']:>8.4f}{r['latency_ms_per_char']:>9.3f}"
+            f"{r['single_char_latency_ms_p50']:>9.3f}{r['weights_bytes'] / 1e6:>9.2f}M"
+            f"{r['file_bytes'] / 1e6:>9.2f}M{r['peak_rss_mb']:>8.1f}"
+        )
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"held_out_set": source, "images": len(labels), "variants": results}, f, indent=2)
+
+    if failed:
+        raise SystemExit(f"❌ Accuracy dropped more than {args.max_accuracy_drop} for: {', '.join(failed)}")
+    print("✅ All variants within the accuracy budget.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,14 @@
+# Recount the admin stats rollup (the stats/shard_* documents) from the students and levels collections.
+# Run from the backend directory whenever the counters may have drifted:
+#   python -m scripts.rebuild_stats
+
+import asyncio
+
+from config import get_async_db
+import stats_rollup
+
+if __name__ == '__main__':
+    summary = asyncio.run(stats_rollup.rebuild(get_async_db()))
+    for key, value in summary.items():
+        print(f"{key}: {value}")
+    print("✅ Stats rollup rebuilt")
@@ -0,0 +1,98 @@
+# Make the levels collection match content/levels.json.
+# Run from the backend directory; safe to re-run, only changed levels are written:
+#   python -m scripts.sync_content --dry-run
+#   python -m scripts.sync_content
+# Levels in Firestore but not in the file are listed, not deleted. Running servers
+# pick up the new content when their level cache expires (LEVEL_CACHE_TTL_SECONDS).
+
+import argparse
+import json
+import os
+
+from config import get_db
+import stats_rollup
+
+DEFAULT_CONTENT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'content', 'levels.json')
+# Fields owned by the content file; anything else on a level document is left alone
+MANAGED_FIELDS = ('level_id', 'tasks', 'translations')
+# Firestore allows at most 500 writes per batch, one is kept for the stats rollup
+BATCH_SIZE = 499
+# predict-task takes one image per letter, 3 to 9 of them (MAX_WORD_LENGTH in scripts/inference.py)
+MIN_WORD_LENGTH = 3
+MAX_WORD_LENGTH = 9
+
+def load_levels(path: str) -> dict:
+    """Level id -> document, validated the way PUT /admin/levels/{level_id} expects it"""
+    with open(path, encoding='utf-8') as f:
+        content = json.load(f)
+
+    levels = {}
+    for level_id, level in content.items():
+        if not level_id.isdigit():
+            raise ValueError(f"Level id '{level_id}' is not a number")
+        tasks, translations = level.get('tasks'), level.get('translations', [])
+        if not tasks or not all(isinstance(word, str) and word.isalpha() for word in tasks):
+            raise ValueError(f"Level {level_id}: tasks must be a non-empty list of words")
+        for word in tasks:
+            if not MIN_WORD_LENGTH <= len(word) <= MAX_WORD_LENGTH:
+                raise ValueError(f"Level {level_id}: '{word}' must have {MIN_WORD_LENGTH} to {MAX_WORD_LENGTH} letters")
+        if len(tasks) != len(translations):
+            raise ValueError(f"Level {level_id}: tasks and translations must have the same length")
+        levels[str(int(level_id))] = {
+            'level_id': int(level_id),
+            'tasks': [word.upper() for word in tasks],
+            'translations': translations
+        }
+    return levels
+
+def level_order(level_id: str):
+    return (0, int(level_id)) if level_id.isdigit() else (1, level_id)
+
+def diff_levels(current: dict, desired: dict):
+    """(new level ids, changed level id -> changed fields, level ids only in Firestore)"""
+    added = [level_id for level_id in desired if level_id not in current]
+    changed = {}
+    for level_id, level in desired.items():
+        if level_id in current:
+            fields = [field for field in MANAGED_FIELDS if current[level_id].get(field) != level[field]]
+            if fields:
+                changed[level_id] = fields
+    extra = [level_id for level_id in current if level_id not in desired]
+    return added, changed, extra
+
+def main():
+    parser = argparse.ArgumentParser(description="Sync level content to Firestore")
+    parser.add_argument("path", nargs="?", default=DEFAULT_CONTENT, help="level file (default: content/levels.json)")
+    parser.add_argument("--dry-run", action="store_true", help="report the changes without writing them")
+    args = parser.parse_args()
+
+    desired = load_levels(args.path)
+    db = get_db()
+    levels_ref = db.collection('levels')
+    current = {level.id: level.to_dict() for level in levels_ref.stream()}
+    added, changed, extra = diff_levels(current, desired)
+
+    for level_id in sorted(added, key=level_order):
+        print(f"+ level {level_id}: {', '.join(desired[level_id]['tasks'])}")
+    for level_id in sorted(changed, key=level_order):
+        for field in changed[level_id]:
+            print(f"~ level {level_id} {field}: {current[level_id].get(field)} -> {desired[level_id][field]}")
+    for level_id in sorted(extra, key=level_order):
+        print(f"⚠️ level {level_id} is not in {os.path.basename(args.path)}; left as it is")
+
+    writes = sorted(added + list(changed), key=level_order)
+    if writes and not args.dry_run:
+        for start in range(0, len(writes), BATCH_SIZE):
+            batch = db.batch()
+            for level_id in writes[start:start + BATCH_SIZE]:
+                batch.set(levels_ref.document(level_id), desired[level_id], merge=True)
+            if start == 0 and added:
+                stats_rollup.record(db, stats_rollup.level_added(len(added)), batch)
+            batch.commit()
+
+    action = "Would write" if args.dry_run else "Wrote"
+    unchanged = len(desired) - len(writes)
+    print(f"✅ {action} {len(added)} new and {len(changed)} changed levels; {unchanged} already up to date")
+
+if __name__ == "__main__":
+    main()
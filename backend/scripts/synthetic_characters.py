@@ -0,0 +1,51 @@
+# Synthetic uppercase character images for offline checks and benchmarks.
+# Dark strokes on a light background like the training set, with random size,
+# position, stroke width, rotation and noise so repeated characters differ.
+
+import os
+import string
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+
+LETTERS = string.ascii_uppercase
+CANVAS_SIZE = 128
+
+def render_character(char: str, rng: np.random.Generator) -> Image.Image:
+    font = ImageFont.load_default(size=int(rng.integers(64, 96)))
+    img = Image.new('L', (CANVAS_SIZE, CANVAS_SIZE), 255)
+    draw = ImageDraw.Draw(img)
+    left, top, right, bottom = draw.textbbox((0, 0), char, font=font)
+    x = (CANVAS_SIZE - (right - left)) // 2 - left + int(rng.integers(-8, 9))
+    y = (CANVAS_SIZE - (bottom - top)) // 2 - top + int(rng.integers(-8, 9))
+    draw.text((x, y), char, fill=0, font=font, stroke_width=int(rng.integers(1, 5)), stroke_fill=0)
+    img = img.rotate(float(rng.uniform(-12, 12)), fillcolor=255)
+
+    noise = rng.normal(0, 12, (CANVAS_SIZE, CANVAS_SIZE))
+    pixels = np.clip(np.asarray(img, dtype=np.float32) + noise, 0, 255).astype(np.uint8)
+    return Image.fromarray(pixels, mode='L').convert('RGB')
+
+def render_word(word: str, rng: np.random.Generator) -> list[Image.Image]:
+    return [render_character(char, rng) for char in word]
+
+def random_word(length: int, rng: np.random.Generator) -> str:
+    return ''.join(rng.choice(list(LETTERS), size=length))
+
+# A labelled set: every letter `per_letter` times
+def labelled_characters(per_letter: int, seed: int = 0) -> tuple[list[Image.Image], list[str]]:
+    rng = np.random.default_rng(seed)
+    labels = [char for char in LETTERS for _ in range(per_letter)]
+    return [render_character(char, rng) for char in labels], labels
+
+# Held-out images laid out one folder per label: DIR/A/*.png, DIR/B/*.png, ...
+def load_labelled_directory(directory: str) -> tuple[list[Image.Image], list[str]]:
+    images, labels = [], []
+    for label in sorted(os.listdir(directory)):
+        label_dir = os.path.join(directory, label)
+        if not os.path.isdir(label_dir):
+            continue
+        for name in sorted(os.listdir(label_dir)):
+            with Image.open(os.path.join(label_dir, name)) as img:
+                images.append(img.copy())
+            labels.append(label.upper())
+    return images, labels
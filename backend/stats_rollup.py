@@ -0,0 +1,158 @@
+from datetime import datetime
+from typing import Dict, Iterable, Optional
+from firebase_admin import firestore
+from google.api_core.exceptions import AlreadyExists
+import logging
+import random
+
+from config import STATS_SHARDS
+
+logger = logging.getLogger(__name__)
+
+# Admin dashboard counters are split over STATS_SHARDS documents (stats/shard_0, ...):
+# each write increments one shard at random, since a single document only sustains about
+# one write per second and every star award writes here. /admin/stats sums the shards in
+# one query. Writers use set(merge=True), which also creates the shard; merge=True treats
+# nested dicts as field paths, so only the given counters change.
+STATS_COLLECTION = 'stats'
+SHARD_PREFIX = 'shard_'
+# Created by the one worker that builds a missing rollup at startup
+BUILD_CLAIM_DOCUMENT = 'build_claim'
+
+def shard_ref(db, shard: int):
+    return db.collection(STATS_COLLECTION).document(f'{SHARD_PREFIX}{shard}')
+
+def record(db, changes: dict, batch):
+    """Add counter changes to `batch` (a WriteBatch or Transaction) so they commit with the data they describe"""
+    if changes:
+        batch.set(shard_ref(db, random.randrange(STATS_SHARDS)), changes, merge=True)
+
+def add_counts(total: dict, counts: dict):
+    for key, value in counts.items():
+        if isinstance(value, dict):
+            add_counts(total.setdefault(key, {}), value)
+        elif isinstance(value, (int, float)):
+            total[key] = total.get(key, 0) + value
+
+def student_added(count: int = 1) -> dict:
+    return {'total_students': firestore.Increment(count)}
+
+def students_removed(progresses: Iterable[dict]) -> dict:
+    """Changes for deleting students with these progress maps, combined into one set of increments"""
+    removed = active = stars = 0
+    completions: Dict[str, int] = {}
+    for progress in progresses:
+        removed += 1
+        total_stars = progress.get('total_stars', 0)
+        if total_stars > 0:
+            active += 1
+            stars += total_stars
+        for key, level in progress.get('levels', {}).items():
+            if level.get('completed_at'):
+                completions[key] = completions.get(key, 0) + 1
+
+    changes = {}
+    if removed:
+        changes['total_students'] = firestore.Increment(-removed)
+    if active:
+        changes['active_students'] = firestore.Increment(-active)
+        changes['total_stars_awarded'] = firestore.Increment(-stars)
+    if completions:
+        changes['level_completions'] = {key: firestore.Increment(-count) for key, count in completions.items()}
+    return changes
+
+def student_removed(progress: dict) -> dict:
+    return students_removed([progress])
+
+def stars_awarded(previous_total: int, new_total: int, completed_level: Optional[int] = None) -> dict:
+    """Changes for one progress update; completed_level only when that level was not completed before"""
+    changes = {}
+    if new_total != previous_total:
+        changes['total_stars_awarded'] = firestore.Increment(new_total - previous_total)
+        if previous_total <= 0 < new_total:
+            changes['active_students'] = firestore.Increment(1)
+    if completed_level is not None:
+        changes['level_completions'] = {str(completed_level): firestore.Increment(1)}
+    return changes
+
+def level_added(count: int = 1) -> dict:
+    return {'total_levels': firestore.Increment(count)}
+
+async def compute(db) -> dict:
+    """Recount everything from the students and levels collections"""
+    summary = {
+        'total_students': 0,
+        'active_students': 0,
+        'total_stars_awarded': 0,
+        'total_levels': 0,
+        'level_completions': {}
+    }
+    async for student in db.collection('students').select(['progress']).stream():
+        progress = (student.to_dict() or {}).get('progress', {})
+        total_stars = progress.get('total_stars', 0)
+        summary['total_students'] += 1
+        summary['total_stars_awarded'] += total_stars
+        if total_stars > 0:
+            summary['active_students'] += 1
+        for key, level in progress.get('levels', {}).items():
+            if level.get('completed_at'):
+                summary['level_completions'][key] = summary['level_completions'].get(key, 0) + 1
+    summary['total_levels'] = len(await db.collection('levels').select([]).get())
+    return summary
+
+async def rebuild(db) -> dict:
+    """Overwrite the rollup with a fresh recount; increments landing mid-scan may be lost, so run it when quiet"""
+    summary = await compute(db)
+    # The count goes to shard 0 and every other shard is emptied, in one batch
+    # (shards left over from a larger STATS_SHARDS are deleted)
+    shards = [shard_ref(db, shard) for shard in range(STATS_SHARDS)]
+    current = {ref.id for ref in shards}
+    batch = db.batch()
+    batch.set(shards[0], {**summary, 'rebuilt_at': datetime.utcnow().isoformat()})
+    for ref in shards[1:]:
+        batch.set(ref, {})
+    async for shard in db.collection(STATS_COLLECTION).select([]).stream():
+        if shard.id.startswith(SHARD_PREFIX) and shard.id not in current:
+            batch.delete(shard.reference)
+    await batch.commit()
+    logger.info(f"Stats rollup rebuilt: {summary}")
+    return summary
+
+async def build_if_missing(db) -> bool:
+    """Build the rollup once if it has never been built; called at startup by every worker,
+    only the one that claims the build runs it. True if this call built it."""
+    if (await read(db))['built']:
+        return False
+    claim = db.collection(STATS_COLLECTION).document(BUILD_CLAIM_DOCUMENT)
+    try:
+        await claim.create({'claimed_at': datetime.utcnow().isoformat()})
+    except AlreadyExists:
+        return False
+    try:
+        await rebuild(db)
+    except Exception:
+        # Let a later start try again
+        await claim.delete()
+        raise
+    return True
+
+async def read(db) -> dict:
+    """Summed counters; `built` is False, with every count zero, until the rollup has
+    had its first full count from build_if_missing() or scripts/rebuild_stats.py"""
+    data, built = {}, False
+    async for shard in db.collection(STATS_COLLECTION).stream():
+        if shard.id.startswith(SHARD_PREFIX):
+            counts = shard.to_dict() or {}
+            built = built or 'rebuilt_at' in counts
+            add_counts(data, counts)
+    # Increments alone do not make a complete rollup; it needs one full count to start from
+    if not built:
+        data = {}
+    return {
+        'built': built,
+        'total_students': data.get('total_students', 0),
+        'active_students': data.get('active_students', 0),
+        'total_levels': data.get('total_levels', 0),
+        'total_stars_awarded': data.get('total_stars_awarded', 0),
+        'level_completions': data.get('level_completions', {})
+    }
@@ -1,70 +1,234 @@
 from fastapi import WebSocket
-from typing import Dict, List
+from collections import OrderedDict
+from typing import Dict, Hashable, Optional, Tuple
+import itertools
+import asyncio
 import json
 import logging
+import time
+
+from broadcast_backend import create_broadcast_backend
+from config import WS_SEND_QUEUE_SIZE, WS_SEND_TIMEOUT_SECONDS
+from leaderboard_index import leaderboard_index
+from nickname_registry import nickname_registry
 
 logger = logging.getLogger(__name__)
 
+# Close code sent to a client dropped for falling behind ("try again later")
+SLOW_CONSUMER_CLOSE_CODE = 1013
+
+SCORE_UPDATES_CHANNEL = 'score_updates'
+LEADERBOARD_CHANNEL = 'leaderboard'
+# Deleted students and the nicknames they freed, for every worker's leaderboard index and
+# nickname registry; not sent to clients
+STUDENTS_REMOVED_CHANNEL = 'students_removed'
+
+def list_of(value) -> list:
+    """`value` if a broadcast field holds a list, otherwise nothing"""
+    return value if isinstance(value, list) else []
+
+class ClientConnection:
+    """One WebSocket with its own outbound queue and writer task.
+
+    Broadcasts only enqueue, so a slow client never holds up the others or the request
+    that triggered the broadcast. A message queued under the same key as one still
+    waiting replaces it in place, since it makes the older one stale; a client whose
+    queue is full of distinct messages cannot keep up and is dropped.
+    """
+
+    _unkeyed = itertools.count()
+
+    def __init__(self, websocket: WebSocket, max_queue: int, on_drop):
+        self.websocket = websocket
+        self.max_queue = max_queue
+        self._on_drop = on_drop
+        # key -> (when the oldest message under this key was queued, newest message)
+        self._pending: "OrderedDict[Hashable, Tuple[float, str]]" = OrderedDict()
+        self._ready = asyncio.Event()
+        self._writer: Optional[asyncio.Task] = None
+        self.closed = False
+        self.connected_at = time.monotonic()
+        self.sent = 0
+        self.coalesced = 0
+        self.last_lag = 0.0
+        self.max_lag = 0.0
+
+    def start(self):
+        self._writer = asyncio.create_task(self._write_loop())
+
+    def enqueue(self, message: str, key: Optional[Hashable] = None) -> bool:
+        """Queue a message without waiting; False if the client is too far behind"""
+        if self.closed:
+            return False
+        if key is None:
+            key = ('unkeyed', next(self._unkeyed))
+        if key in self._pending:
+            self._pending[key] = (self._pending[key][0], message)
+            self.coalesced += 1
+            return True
+        if len(self._pending) >= self.max_queue:
+            return False
+        self._pending[key] = (time.monotonic(), message)
+        self._ready.set()
+        return True
+
+    async def _write_loop(self):
+        try:
+            while True:
+                await self._ready.wait()
+                while self._pending:
+                    _, (enqueued_at, message) = self._pending.popitem(last=False)
+                    await asyncio.wait_for(self.websocket.send_text(message), WS_SEND_TIMEOUT_SECONDS)
+                    self.sent += 1
+                    self.last_lag = time.monotonic() - enqueued_at
+                    self.max_lag = max(self.max_lag, self.last_lag)
+                self._ready.clear()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            # Send failed or timed out: the client is gone or stuck
+            logger.warning(f"Dropping a WebSocket client after a failed send: {e!r}")
+            self._on_drop(self)
+
+    async def close(self, code: int):
+        self.stop()
+        try:
+            await asyncio.wait_for(self.websocket.close(code=code), WS_SEND_TIMEOUT_SECONDS)
+        except Exception:
+            pass
+
+    def stop(self):
+        self.closed = True
+        self._pending.clear()
+        if self._writer is not None and self._writer is not asyncio.current_task():
+            self._writer.cancel()
+
+    def metrics(self) -> dict:
+        client = self.websocket.client
+        return {
+            "client": f"{client.host}:{client.port}" if client else None,
+            "connected_seconds": time.monotonic() - self.connected_at,
+            "queued": len(self._pending),
+            "oldest_queued_seconds": time.monotonic() - next(iter(self._pending.values()))[0] if self._pending else 0.0,
+            "sent": self.sent,
+            "coalesced": self.coalesced,
+            "last_lag_ms": self.last_lag * 1000,
+            "max_lag_ms": self.max_lag * 1000,
+        }
+
 class ConnectionManager:
-    def __init__(self):
-        self.score_connections: List[WebSocket] = []
-        self.leaderboard_connections: List[WebSocket] = []
-    
-    async def connect_score_updates(self, websocket: WebSocket):
+    """WebSocket clients of this process. Broadcasts go through `backend`, which hands
+    them back to deliver() here and, with a broker, in every other worker and instance."""
+
+    def __init__(self, backend, index=leaderboard_index, registry=nickname_registry, max_queue: int = WS_SEND_QUEUE_SIZE):
+        self.backend = backend
+        self.index = index
+        self.registry = registry
+        self.backend.subscribe(self.deliver)
+        self.max_queue = max_queue
+        self.score_connections: Dict[WebSocket, ClientConnection] = {}
+        self.leaderboard_connections: Dict[WebSocket, ClientConnection] = {}
+        self._dropped = {"score_updates": 0, "leaderboard": 0}
+
+    async def start(self):
+        await self.backend.start()
+
+    async def stop(self):
+        await self.backend.stop()
+
+    async def _connect(self, connections: Dict[WebSocket, ClientConnection], websocket: WebSocket):
         await websocket.accept()
-        self.score_connections.append(websocket)
+        connection = ClientConnection(websocket, self.max_queue, self._drop)
+        connections[websocket] = connection
+        connection.start()
+
+    async def connect_score_updates(self, websocket: WebSocket):
+        await self._connect(self.score_connections, websocket)
         logger.info(f"Score updates connection established. Total: {len(self.score_connections)}")
-    
+
     async def connect_leaderboard(self, websocket: WebSocket):
-        await websocket.accept()
-        self.leaderboard_connections.append(websocket)
+        await self._connect(self.leaderboard_connections, websocket)
         logger.info(f"Leaderboard connection established. Total: {len(self.leaderboard_connections)}")
-    
+
     def disconnect_score_updates(self, websocket: WebSocket):
-        if websocket in self.score_connections:
-            self.score_connections.remove(websocket)
+        connection = self.score_connections.pop(websocket, None)
+        if connection is not None:
+            connection.stop()
             logger.info(f"Score updates connection removed. Total: {len(self.score_connections)}")
-    
+
     def disconnect_leaderboard(self, websocket: WebSocket):
-        if websocket in self.leaderboard_connections:
-            self.leaderboard_connections.remove(websocket)
+        connection = self.leaderboard_connections.pop(websocket, None)
+        if connection is not None:
+            connection.stop()
             logger.info(f"Leaderboard connection removed. Total: {len(self.leaderboard_connections)}")
-    
-    async def broadcast_score_update(self, data: dict):
-        """Broadcast score changes to all connected clients"""
-        if not self.score_connections:
+
+    def _drop(self, connection: ClientConnection):
+        """Disconnect a client that fell behind or failed a send"""
+        if connection.closed:
             return
-        
-        message = json.dumps(data)
-        disconnected = []
-        
-        for connection in self.score_connections:
-            try:
-                await connection.send_text(message)
-            except Exception:
-                disconnected.append(connection)
-        
-        # Clean up disconnected clients
-        for conn in disconnected:
-            self.disconnect_score_updates(conn)
-    
+        if self.score_connections.get(connection.websocket) is connection:
+            self._dropped["score_updates"] += 1
+            self.disconnect_score_updates(connection.websocket)
+        elif self.leaderboard_connections.get(connection.websocket) is connection:
+            self._dropped["leaderboard"] += 1
+            self.disconnect_leaderboard(connection.websocket)
+        asyncio.create_task(connection.close(SLOW_CONSUMER_CLOSE_CODE))
+
+    def _fan_out(self, connections: Dict[WebSocket, ClientConnection], message: str, key: Optional[Hashable]):
+        for connection in list(connections.values()):
+            if not connection.enqueue(message, key):
+                logger.warning("Dropping a WebSocket client whose send queue is full")
+                self._drop(connection)
+
+    def deliver(self, channel: str, message: dict):
+        """Apply a published change to this process's leaderboard index and queue it for
+        its clients; never waits on a client"""
+        if channel == SCORE_UPDATES_CHANNEL:
+            user_id = message.get('user_id')
+            # Every worker keeps its own index, so each applies every worker's score changes
+            if isinstance(user_id, str) and isinstance(message.get('nickname'), str) and isinstance(message.get('total_stars'), int):
+                self.index.update(user_id, message['nickname'], message['total_stars'])
+            if self.score_connections:
+                # A student's newer total supersedes one still queued
+                self._fan_out(self.score_connections, json.dumps(message), ('score', user_id) if user_id else None)
+        elif channel == STUDENTS_REMOVED_CHANNEL:
+            for uid in list_of(message.get('user_ids')):
+                if isinstance(uid, str):
+                    self.index.remove(uid)
+            for nickname in list_of(message.get('nicknames')):
+                if isinstance(nickname, str):
+                    self.registry.discard(nickname)
+        elif channel == LEADERBOARD_CHANNEL and self.leaderboard_connections:
+            # Each message is the whole top 5, so only the newest is worth sending
+            self._fan_out(self.leaderboard_connections, json.dumps(message), 'top5')
+
+    async def broadcast_score_update(self, data: dict):
+        """Send a score change ({user_id, nickname, total_stars}) to every connected
+        client and leaderboard index, on all workers"""
+        await self.backend.publish(SCORE_UPDATES_CHANNEL, data)
+
+    async def broadcast_students_removed(self, user_ids: list, nicknames: list = ()):
+        """Drop deleted students from the leaderboard index, and the nicknames they freed
+        from the nickname registry, on all workers"""
+        await self.backend.publish(STUDENTS_REMOVED_CHANNEL, {"user_ids": user_ids, "nicknames": list(nicknames)})
+
     async def broadcast_leaderboard_update(self, leaderboard_data: list):
-        """Broadcast top 5 leaderboard to all connected clients"""
-        if not self.leaderboard_connections:
-            return
-        
-        message = json.dumps({"top5": leaderboard_data})
-        disconnected = []
-        
-        for connection in self.leaderboard_connections:
-            try:
-                await connection.send_text(message)
-            except Exception:
-                disconnected.append(connection)
-        
-        # Clean up disconnected clients
-        for conn in disconnected:
-            self.disconnect_leaderboard(conn)
+        """Send the top 5 leaderboard to every connected client, on all workers"""
+        await self.backend.publish(LEADERBOARD_CHANNEL, {"top5": leaderboard_data})
+
+    def metrics(self) -> dict:
+        return {
+            "broadcast": self.backend.metrics(),
+            "send_queue_size": self.max_queue,
+            "score_updates": {
+                "connections": [connection.metrics() for connection in self.score_connections.values()],
+                "dropped_slow_consumers": self._dropped["score_updates"],
+            },
+            "leaderboard": {
+                "connections": [connection.metrics() for connection in self.leaderboard_connections.values()],
+                "dropped_slow_consumers": self._dropped["leaderboard"],
+            },
+        }
 
 # Global connection manager instance
-manager = ConnectionManager()
\ No newline at end of file
+manager = ConnectionManager(create_broadcast_backend())